@@ -0,0 +1,518 @@
+#!/usr/bin/env python3
+"""Benchmarks for the DIMM capture path."""
+import argparse
+import contextlib
+import csv
+import io
+import json
+import os
+import platform
+import re
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+from copy_and_tar_dimm_data import DimmTarCaptureHandler
+from dimm_fits import BLOCK_SIZE
+from dimm_inotify import InotifyFileWatcher
+from dimm_seeing import locate_spots, locate_spots_batch
+from simulate_dimm_frames import synthetic_spot_stack
+
+
+def percentile(sorted_values, q):
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return 0
+    rank = min(len(sorted_values) - 1, max(0, round(q / 100 * len(sorted_values)) - 1))
+    return sorted_values[rank]
+
+
+def _start_watcher(backend, path, callback):
+    if backend == "inotify":
+        watcher = InotifyFileWatcher(path, callback)
+    else:
+        from watchdog.events import FileSystemEventHandler
+        from watchdog.observers import Observer
+
+        class Probe(FileSystemEventHandler):
+            # Same filtering work as DimmTarCaptureHandler.on_closed
+            def on_closed(self, event):
+                if event.src_path != str(path):
+                    return
+                callback()
+
+        watcher = Observer()
+        watcher.schedule(Probe(), str(Path(path).parent), recursive=False)
+    watcher.start()
+    return watcher
+
+
+def measure_event_latency(backend, path, frames=500, rate=100.0, frame_size=28800):
+    """Write ``frames`` files at ``rate`` Hz and time close() to callback.
+
+    Returns the list of latencies in nanoseconds and the number of callbacks
+    received. Sent and received events are paired in order, which is only
+    right if every write produced exactly one callback, so the latencies are
+    empty when the count is off (a coalesced or a spurious event).
+    """
+    received = []
+    watcher = _start_watcher(backend, path, lambda: received.append(time.monotonic_ns()))
+    time.sleep(0.2)
+
+    payload = os.urandom(frame_size)
+    sent = []
+    period = 1.0 / rate
+    next_tick = time.monotonic()
+    for _ in range(frames):
+        f = open(path, "wb")
+        f.write(payload)
+        sent.append(time.monotonic_ns())
+        f.close()
+        next_tick += period
+        time.sleep(max(0.0, next_tick - time.monotonic()))
+
+    time.sleep(0.5)
+    watcher.stop()
+    watcher.join()
+    if len(received) != frames:
+        return [], len(received)
+    return [r - s for s, r in zip(sent, received)], len(received)
+
+
+def run_latency(args):
+    backends = ["watchdog", "inotify"] if args.backend == "both" else [args.backend]
+    print(f"Event-to-callback latency, {args.frames} frames at {args.rate} Hz\n")
+    print(f"{'backend':10s} {'events':>8s} {'mean_us':>9s} {'p50_us':>9s} "
+          f"{'p99_us':>9s} {'max_us':>9s}")
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(args.dir or tmp) / "boxframe.fits"
+        path.write_bytes(b"")
+        for backend in backends:
+            latencies, received = measure_event_latency(
+                backend, path, args.frames, args.rate, args.frame_size
+            )
+            if not latencies:
+                print(
+                    f"{backend:10s} {received:>4d}/{args.frames:<3d} "
+                    "events could not be paired with writes"
+                )
+                continue
+            latencies.sort()
+            mean = sum(latencies) / len(latencies)
+            print(
+                f"{backend:10s} {received:>4d}/{args.frames:<3d} {mean / 1000:9.1f} "
+                f"{percentile(latencies, 50) / 1000:9.1f} "
+                f"{percentile(latencies, 99) / 1000:9.1f} "
+                f"{latencies[-1] / 1000:9.1f}"
+            )
+
+
+def fake_fits_frame(width=128, height=100):
+    """A minimal valid 16-bit FITS file of the given size, with noise pixels."""
+    cards = [
+        "SIMPLE  =                    T",
+        "BITPIX  =                   16",
+        "NAXIS   =                    2",
+        f"NAXIS1  = {width:20d}",
+        f"NAXIS2  = {height:20d}",
+        "END",
+    ]
+    header = "".join(card.ljust(80) for card in cards).encode("ascii")
+    header += b" " * (-len(header) % BLOCK_SIZE)
+    data = os.urandom(2 * width * height)
+    return header + data + b"\0" * (-len(data) % BLOCK_SIZE)
+
+
+def measure_read_path(path, tmp, frames, zero_copy, background_writer, trace=False):
+    """Capture ``frames`` reads of ``path`` and return (seconds, peak bytes, handler).
+
+    The peak traced memory is only measured with ``trace``, which slows the
+    run down, so timings should come from an untraced run.
+    """
+    handler = DimmTarCaptureHandler(
+        path,
+        Path(tmp) / "alloc.tar",
+        duration_seconds=float("inf"),
+        codec="none",
+        zero_copy=zero_copy,
+        background_writer=background_writer,
+        frame_log=False,
+    )
+    if trace:
+        tracemalloc.start()
+    t0 = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        for _ in range(frames):
+            handler.capture_frame()
+        handler.close()
+    seconds = time.perf_counter() - t0
+    peak = 0
+    if trace:
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+    return seconds, peak, handler
+
+
+def run_alloc(args):
+    print(f"Frame read path, {args.frames} frames of {args.width}x{args.height}\n")
+    print(
+        f"{'read path':24s} {'us/frame':>9s} {'peak_kB':>9s} "
+        f"{'buffers':>9s} {'dropped':>9s}"
+    )
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / "boxframe.fits"
+        path.write_bytes(fake_fits_frame(args.width, args.height))
+        for background_writer in (False, True):
+            for zero_copy in (False, True):
+                seconds, _, handler = measure_read_path(
+                    path, tmp, args.frames, zero_copy, background_writer
+                )
+                _, peak, _ = measure_read_path(
+                    path, tmp, args.frames, zero_copy, background_writer, trace=True
+                )
+                label = ("pooled" if zero_copy else "read()") + (
+                    " + writer thread" if background_writer else ""
+                )
+                buffers = handler.pool.allocations if zero_copy else "per read"
+                print(
+                    f"{label:24s} {seconds / args.frames * 1e6:9.1f} "
+                    f"{peak / 1024:9.1f} {buffers:>9} "
+                    f"{args.frames - handler.copy_count:>9d}"
+                )
+
+
+def run_centroid(args):
+    import numpy as np
+
+    print(
+        f"Two-spot centroiding, {args.frames} frames of {args.width}x{args.height}, "
+        f"{args.jitter} px jitter\n"
+    )
+    stack, truth = synthetic_spot_stack(
+        args.frames, args.width, args.height, jitter=args.jitter, seed=args.seed
+    )
+    print(f"{'method':12s} {'seconds':>9s} {'us/frame':>9s} {'frames/s':>10s} "
+          f"{'rms_px':>8s} {'missed':>7s}")
+
+    t0 = time.perf_counter()
+    looped = np.full(truth.shape, np.nan)
+    for i, frame in enumerate(stack):
+        spots = locate_spots(frame)
+        if spots is not None:
+            looped[i] = spots
+    loop_seconds = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    batched = locate_spots_batch(stack, chunk_frames=args.chunk_frames)
+    batch_seconds = time.perf_counter() - t0
+
+    for label, seconds, spots in (
+        ("per-frame", loop_seconds, looped),
+        ("batch", batch_seconds, batched),
+    ):
+        missed = np.isnan(spots[:, :, 0]).any(axis=1)
+        error = spots[~missed] - truth[~missed]
+        rms = np.sqrt(np.mean(error**2)) if len(error) else float("nan")
+        print(
+            f"{label:12s} {seconds:9.3f} {seconds / args.frames * 1e6:9.1f} "
+            f"{args.frames / seconds:10.0f} {rms:8.4f} {missed.sum():7d}"
+        )
+    print(f"\nBatch speedup: {loop_seconds / batch_seconds:.1f}x")
+
+
+SUITE_FIELDS = (
+    "backend",
+    "codec",
+    "width",
+    "height",
+    "frame_bytes",
+    "rate",
+    "frames",
+    "captured",
+    "duplicates",
+    "sustained_hz",
+    "cpu_us_per_frame",
+    "p50_latency_ms",
+    "p99_latency_ms",
+    "drop_fraction",
+    "torn_frames",
+    "sim_late",
+    "sim_max_delay_ms",
+)
+
+
+class _ArchiveLatencyProbe:
+    """Wrap a capture writer to time each frame from exposure to archived.
+
+    Also collects the header counter the handler passes with every archived
+    frame: unique counters, not archived frames, say how many camera frames
+    were kept. Re-reads of the same file the handler recognised are counted
+    in its ``duplicates`` instead.
+    """
+
+    def __init__(self, writer):
+        self.writer = writer
+        self.latencies = []
+        self.counters = set()
+        self.last_time = None
+
+    def add_frame(self, name, data, mtime, counter=None):
+        accepted = self.writer.add_frame(name, data, mtime, counter)
+        self.last_time = time.time()
+        # mtime is the frame's DATE-OBS, stamped by the simulator just before writing
+        self.latencies.append(self.last_time - mtime)
+        self.counters.add(counter)
+        return accepted
+
+    def close(self):
+        self.writer.close()
+
+
+def measure_capture(
+    backend, codec, width, height, rate, seconds, tmp, background_writer=False
+):
+    """Capture ``seconds`` of simulated frames and return one row of results.
+
+    The simulator runs in its own process, as the camera would, so the CPU
+    time measured here is the capture side only (watcher, read, archive).
+    Its own count of late writes and worst delay are kept in the row: drops
+    in a run where the simulator itself fell behind say little about the
+    capture. Latency is timed at the innermost archive writer, so with
+    ``background_writer`` it includes the time spent queued.
+    """
+    path = Path(tmp) / "boxframe.fits"
+    path.unlink(missing_ok=True)
+    path.touch()
+    frames = max(1, round(rate * seconds))
+    handler = DimmTarCaptureHandler(
+        path,
+        Path(tmp) / f"suite_{backend}_{codec}.tar",
+        duration_seconds=0,
+        codec=codec,
+        background_writer=background_writer,
+        frame_log=False,
+    )
+    if handler.queue_writer is not None:
+        probe = _ArchiveLatencyProbe(handler.queue_writer.writer)
+        handler.queue_writer.writer = probe
+    else:
+        probe = _ArchiveLatencyProbe(handler.writer)
+        handler.writer = probe
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        if backend == "inotify":
+            watcher = InotifyFileWatcher(path, handler.capture_frame)
+        else:
+            from watchdog.observers import Observer
+
+            watcher = Observer()
+            watcher.schedule(handler, str(path.parent), recursive=False)
+        watcher.start()
+        time.sleep(0.2)
+
+        cpu0 = time.process_time()
+        simulator = subprocess.run(
+            [
+                sys.executable,
+                str(Path(__file__).with_name("simulate_dimm_frames.py")),
+                str(path),
+                "--frames",
+                str(frames),
+                "--rate",
+                str(rate),
+                "--width",
+                str(width),
+                "--height",
+                str(height),
+                "--seed",
+                "0",
+            ],
+            check=True,
+            stdout=subprocess.PIPE,
+            text=True,
+        )
+        # Let the capture drain whatever is still queued
+        count = -1
+        while count != handler.copy_count:
+            count = handler.copy_count
+            time.sleep(0.3)
+        watcher.stop()
+        watcher.join()
+        handler.close()
+        cpu = time.process_time() - cpu0
+
+    # The simulator's last line: "... N late, max delay X ms"
+    late, max_delay = re.search(
+        r"(\d+) late, max delay ([\d.]+) ms", simulator.stdout
+    ).groups()
+    captured = handler.copy_count
+    unique = len(probe.counters)
+    span = probe.last_time - handler.start_time if captured > 1 else 0
+    latencies = sorted(probe.latencies)
+    return {
+        "backend": backend,
+        "codec": codec,
+        "width": width,
+        "height": height,
+        "frame_bytes": len(fake_fits_frame(width, height)),
+        "rate": rate,
+        "frames": frames,
+        "captured": captured,
+        "duplicates": handler.duplicates,
+        "sustained_hz": round((unique - 1) / span, 2) if span > 0 else 0.0,
+        "cpu_us_per_frame": round(cpu / captured * 1e6, 1) if captured else 0.0,
+        "p50_latency_ms": round(percentile(latencies, 50) * 1000, 3),
+        "p99_latency_ms": round(percentile(latencies, 99) * 1000, 3),
+        "drop_fraction": round((frames - unique) / frames, 4),
+        "torn_frames": handler.torn_frames,
+        "sim_late": int(late),
+        "sim_max_delay_ms": float(max_delay),
+    }
+
+
+def write_suite_results(path, rows, settings):
+    """Save suite rows as CSV, or as JSON with the run settings for ``.json``."""
+    if str(path).endswith(".json"):
+        document = {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+            "settings": settings,
+            "results": rows,
+        }
+        Path(path).write_text(json.dumps(document, indent=2) + "\n")
+        return
+    with open(path, "w", newline="") as f:
+        writer = csv.DictWriter(f, SUITE_FIELDS)
+        writer.writeheader()
+        writer.writerows(rows)
+
+
+def run_suite(args):
+    sizes = [tuple(int(n) for n in size.split("x")) for size in args.sizes.split(",")]
+    rates = [float(rate) for rate in args.rates.split(",")]
+    codecs = args.codecs.split(",")
+    backends = args.backends.split(",")
+    print(
+        f"Capture suite: {len(backends)} backends x {len(codecs)} codecs x "
+        f"{len(sizes)} sizes x {len(rates)} rates, {args.seconds}s each\n"
+    )
+    print(
+        f"{'backend':>9s} {'codec':>6s} {'size':>9s} {'rate':>6s} {'hz':>7s} "
+        f"{'cpu_us':>8s} {'p50_ms':>8s} {'p99_ms':>8s} {'dropped':>8s} {'dup':>5s} "
+        f"{'late':>5s}"
+    )
+
+    rows = []
+    with tempfile.TemporaryDirectory() as tmp:
+        for backend in backends:
+            for codec in codecs:
+                for width, height in sizes:
+                    for rate in rates:
+                        row = measure_capture(
+                            backend,
+                            codec,
+                            width,
+                            height,
+                            rate,
+                            args.seconds,
+                            args.dir or tmp,
+                            args.background_writer,
+                        )
+                        rows.append(row)
+                        print(
+                            f"{backend:>9s} {codec:>6s} {f'{width}x{height}':>9s} "
+                            f"{rate:6.0f} {row['sustained_hz']:7.1f} "
+                            f"{row['cpu_us_per_frame']:8.1f} "
+                            f"{row['p50_latency_ms']:8.2f} {row['p99_latency_ms']:8.2f} "
+                            f"{row['drop_fraction']:8.2%} {row['duplicates']:5d} "
+                            f"{row['sim_late']:5d}"
+                        )
+
+    if args.output:
+        keys = ("backends", "codecs", "sizes", "rates", "seconds", "background_writer")
+        settings = {key: getattr(args, key) for key in keys}
+        write_suite_results(args.output, rows, settings)
+        print(f"\nResults: {args.output}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    latency = subparsers.add_parser(
+        "latency", help="Compare event-to-callback latency of the file event backends"
+    )
+    latency.add_argument(
+        "--backend",
+        choices=("watchdog", "inotify", "both"),
+        default="both",
+        help="Backend(s) to measure (default: both)",
+    )
+    latency.add_argument("-n", "--frames", type=int, default=500)
+    latency.add_argument("--rate", type=float, default=100.0, help="Frames per second")
+    latency.add_argument("--frame-size", type=int, default=28800, help="Bytes per frame")
+    latency.add_argument(
+        "--dir", help="Directory for the test file (default: a temporary directory)"
+    )
+    latency.set_defaults(func=run_latency)
+
+    alloc = subparsers.add_parser(
+        "alloc", help="Compare the plain and pooled zero-copy frame read paths"
+    )
+    alloc.add_argument("-n", "--frames", type=int, default=5000)
+    alloc.add_argument("--width", type=int, default=128)
+    alloc.add_argument("--height", type=int, default=100)
+    alloc.set_defaults(func=run_alloc)
+
+    centroid = subparsers.add_parser(
+        "centroid", help="Compare per-frame and batch two-spot centroiding"
+    )
+    centroid.add_argument("-n", "--frames", type=int, default=10000)
+    centroid.add_argument("--width", type=int, default=128)
+    centroid.add_argument("--height", type=int, default=100)
+    centroid.add_argument(
+        "--jitter", type=float, default=1.0, help="Spot motion in pixels RMS"
+    )
+    centroid.add_argument(
+        "--chunk-frames", type=int, default=256, help="Frames per batch reduction"
+    )
+    centroid.add_argument("--seed", type=int, default=0)
+    centroid.set_defaults(func=run_centroid)
+
+    suite = subparsers.add_parser(
+        "suite",
+        help="Drive the capture path with simulated frames across rates, sizes, "
+        "codecs and backends",
+    )
+    suite.add_argument(
+        "--rates", default="50,100,200,400", help="Comma-separated frame rates in Hz"
+    )
+    suite.add_argument(
+        "--sizes", default="128x100,256x256", help="Comma-separated WIDTHxHEIGHT"
+    )
+    suite.add_argument("--codecs", default="none,gzip", help="Comma-separated codecs")
+    suite.add_argument(
+        "--backends", default="inotify,watchdog", help="Comma-separated backends"
+    )
+    suite.add_argument(
+        "--seconds", type=float, default=5.0, help="Seconds of frames per point"
+    )
+    suite.add_argument(
+        "--background-writer",
+        action="store_true",
+        help="Capture with the background writer thread",
+    )
+    suite.add_argument(
+        "-o", "--output", help="Save results as CSV, or JSON if the name ends in .json"
+    )
+    suite.add_argument(
+        "--dir", help="Directory for the test files (default: a temporary directory)"
+    )
+    suite.set_defaults(func=run_suite)
+
+    args = parser.parse_args()
+    args.func(args)
@@ -1,74 +1,766 @@
 #!/usr/bin/env python3
 import argparse
-import io
+import collections
+import concurrent.futures
+import contextlib
+import functools
+import importlib
+import os
+import queue
 import shutil
+import signal
+import socket
+import threading
 import time
-import tarfile
 from pathlib import Path
 from datetime import datetime, timezone
-from watchdog.observers import Observer
-from watchdog.events import FileSystemEventHandler
+from dimm_archive import index_path_for
+from dimm_dashboard import EventCounter, StatusDashboard, interval_stats
+from dimm_encoders import FRAME_ENCODINGS, EncodingArchiveWriter, open_frame_encoder
+from dimm_fits import (
+    COUNTER_KEYWORDS,
+    TIME_KEYWORDS,
+    check_frame,
+    header_timestamp,
+    read_keywords,
+)
+from dimm_inotify import InotifyFileWatcher, InotifyMultiFileWatcher
+from dimm_pipeline import (
+    FRAME_LOG_SUFFIX,
+    BackgroundArchiveWriter,
+    FrameLog,
+    PooledArchiveWriter,
+    RingBufferWriter,
+    RotatingArchiveWriter,
+)
+from dimm_seeing import (
+    DEFAULT_WAVELENGTH,
+    SEEING_LOG_SUFFIX,
+    SeeingEstimator,
+    SeeingMonitor,
+)
+from dimm_writers import (
+    CODEC_PACKAGES,
+    CODECS,
+    OUTPUT_FORMATS,
+    CentroidTableWriter,
+    FrameCubeWriter,
+    open_archive_writer,
+)
+
+try:
+    from watchdog.observers import Observer
+    from watchdog.events import FileSystemEventHandler
+except ImportError:  # only the inotify backend is available
+    Observer = None
+    FileSystemEventHandler = object
+
+BACKENDS = ("watchdog", "inotify")
+
+
+class TriggerSocketListener:
+    """Accept ``trigger`` commands on a local Unix socket.
+
+    Each connection sends one line; ``trigger`` calls ``callback()`` and is
+    answered with ``ok``. For example: ``echo trigger | nc -U dimm.sock``.
+    """
+
+    def __init__(self, path, callback):
+        self.path = Path(path)
+        self.callback = callback
+        self.path.unlink(missing_ok=True)
+        self._sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self._sock.bind(str(self.path))
+        self._sock.listen()
+        self._sock.settimeout(0.2)
+        self._stop = threading.Event()
+        self._thread = threading.Thread(
+            target=self._serve, name="dimm-trigger-socket", daemon=True
+        )
+        self._thread.start()
+
+    def _serve(self):
+        while not self._stop.is_set():
+            try:
+                conn, _ = self._sock.accept()
+            except socket.timeout:
+                continue
+            with conn:
+                conn.settimeout(1.0)
+                try:
+                    command = conn.recv(256).strip().lower()
+                    if command == b"trigger":
+                        self.callback()
+                        conn.sendall(b"ok\n")
+                    else:
+                        conn.sendall(b"unknown command\n")
+                except OSError:
+                    pass
+
+    def close(self):
+        self._stop.set()
+        self._thread.join()
+        self._sock.close()
+        self.path.unlink(missing_ok=True)
+
+
+class FrameBufferPool:
+    """Reusable ``bytearray`` buffers for reading frames without allocating.
+
+    ``acquire`` hands out a free buffer (allocating only when none is free or
+    the frame outgrew it) and ``release`` takes back either the buffer or a
+    memoryview of it. Safe to release from another thread.
+    """
+
+    def __init__(self, buffer_size=0):
+        self.buffer_size = buffer_size
+        self.allocations = 0
+        self._free = queue.SimpleQueue()
+
+    def acquire(self, size):
+        try:
+            buf = self._free.get_nowait()
+        except queue.Empty:
+            buf = None
+        if buf is None or len(buf) < size:
+            self.buffer_size = max(self.buffer_size, size)
+            buf = bytearray(self.buffer_size)
+            self.allocations += 1
+        return buf
+
+    def release(self, buf):
+        if isinstance(buf, memoryview):
+            buf = buf.obj
+        self._free.put(buf)
+
+
+class FrameGapDetector:
+    """Detect frames the camera wrote but that were never seen.
+
+    Uses the header frame counter when there is one: a jump of more than one
+    means frames were missed. Otherwise inter-arrival times are compared with
+    the expected cadence (``expected_rate`` in Hz, or the median of recent
+    intervals): an interval longer than ``tolerance`` periods counts as a gap
+    of ``round(interval / period) - 1`` frames.
+    """
+
+    def __init__(self, expected_rate=None, tolerance=1.5, history=50, max_gaps=1000):
+        self.expected_period = 1.0 / expected_rate if expected_rate else None
+        self.tolerance = tolerance
+        self.max_gaps = max_gaps
+        self.dropped = 0
+        self.gap_count = 0
+        self.longest_gap = 0.0
+        self.longest_gap_time = None
+        self.gaps = []  # (time, missing frames, gap seconds), first max_gaps only
+        self._intervals = collections.deque(maxlen=history)
+        self._last_counter = None
+        self._last_time = None
+
+    def period(self):
+        """Expected seconds between frames, or None while still unknown."""
+        if self.expected_period:
+            return self.expected_period
+        if len(self._intervals) < 5:
+            return None
+        return sorted(self._intervals)[len(self._intervals) // 2]
+
+    def update(self, counter, frame_time):
+        """Account for one received frame; returns how many were missed before it."""
+        missing = 0
+        interval = None if self._last_time is None else frame_time - self._last_time
+
+        if isinstance(counter, int) and self._last_counter is not None:
+            if counter > self._last_counter:
+                missing = counter - self._last_counter - 1
+        elif interval is not None:
+            period = self.period()
+            if period and interval > self.tolerance * period:
+                missing = max(0, round(interval / period) - 1)
+            else:
+                self._intervals.append(interval)
+
+        if missing:
+            self.dropped += missing
+            self.gap_count += 1
+            if len(self.gaps) < self.max_gaps:
+                self.gaps.append((frame_time, missing, interval or 0.0))
+            if interval is not None and interval > self.longest_gap:
+                self.longest_gap = interval
+                self.longest_gap_time = frame_time
+
+        self._last_counter = counter if isinstance(counter, int) else None
+        self._last_time = frame_time
+        return missing
+
+    def print_stats(self, received, limit=10):
+        expected = received + self.dropped
+        fraction = self.dropped / expected if expected else 0
+        print(
+            f"Dropped frames: {self.dropped} of {expected} ({fraction:.2%}) "
+            f"in {self.gap_count} gaps"
+        )
+        if self.longest_gap_time is not None:
+            print(
+                f"Longest gap: {self.longest_gap * 1000:.1f} ms at "
+                f"{format_utc(self.longest_gap_time)}"
+            )
+        for when, missing, gap in self.gaps[:limit]:
+            print(f"  {format_utc(when)}: {missing} missing ({gap * 1000:.1f} ms)")
+        if self.gap_count > limit:
+            print(f"  ... {self.gap_count - limit} more gaps")
+
+
+def format_utc(when):
+    """ISO-like UTC string with milliseconds for a Unix time."""
+    return datetime.fromtimestamp(when, timezone.utc).strftime("%Y-%m-%d %H:%M:%S.%f")[:-3]
 
 
 class DimmTarCaptureHandler(FileSystemEventHandler):
-    def __init__(self, source_file, tar_path, duration_seconds):
+    def __init__(
+        self,
+        source_file,
+        tar_path,
+        duration_seconds,
+        background_writer=False,
+        queue_size=256,
+        codec="gzip",
+        level=None,
+        workers=None,
+        block_frames=16,
+        index=False,
+        output_format="tar",
+        frame_encoding="raw",
+        keyframe_interval=100,
+        keep_every=None,
+        verify=True,
+        read_retries=3,
+        retry_delay=0.001,
+        zero_copy=False,
+        ring_seconds=None,
+        post_seconds=10.0,
+        ring_frames=None,
+        rotate_seconds=None,
+        rotate_bytes=None,
+        time_keywords=TIME_KEYWORDS,
+        counter_keywords=COUNTER_KEYWORDS,
+        frame_log=True,
+        expected_rate=None,
+        seeing=False,
+        pixel_scale=None,
+        aperture=None,
+        baseline=None,
+        wavelength=DEFAULT_WAVELENGTH,
+        seeing_interval=10.0,
+        executor=None,
+    ):
         self.source = Path(source_file)
         self.tar_path = tar_path
         self.duration = duration_seconds
         self.start_time = None
         self.copy_count = 0
+        self.arrivals = EventCounter()
         self.stop_observer = False
-        self.tar_file = tarfile.open(tar_path, "w:gz")
+        self.verify = verify
+        self.read_retries = read_retries
+        self.retry_delay = retry_delay
+        self.torn_reads = 0
+        self.torn_frames = 0
+        self.last_torn = None  # why the latest torn frame was skipped
+        self.last_gap = None  # (missing frames, frame time) of the latest gap
+        # Set while a status dashboard shows these: gaps and torn frames are
+        # then only counted, not printed one line each
+        self.quiet = False
+        self.pool = FrameBufferPool() if zero_copy else None
+        self.time_keywords = tuple(time_keywords)
+        self.counter_keywords = tuple(counter_keywords)
+        self.header_keywords = self.time_keywords + self.counter_keywords
+        self._last_timestamp = None
+        self._repeats = 0
+        self._last_counter = None
+        self._last_read = None
+        self.read_stat = None
+        self.duplicates = 0
+        self.gaps = FrameGapDetector(expected_rate)
+        self.header_timed = 0
+        self.latency_total = 0.0
+        self.latency_max = None
+        self.frame_log = None
+        rotating = bool(rotate_seconds or rotate_bytes)
+        if frame_log and not ring_seconds:
+            # A ring buffer only archives around triggers, so it keeps no log
+            # of every frame; rotated archives each get their own log
+            self.frame_log = FrameLog(
+                None if rotating else f"{tar_path}{FRAME_LOG_SUFFIX}"
+            )
+        self.seeing = None
+        if seeing:
+            estimator = SeeingEstimator(
+                pixel_scale, aperture, baseline, wavelength, seeing_interval
+            )
+            self.seeing = SeeingMonitor(
+                estimator, log_path=f"{tar_path}{SEEING_LOG_SUFFIX}"
+            )
+        self.encoder = open_frame_encoder(frame_encoding, keyframe_interval)
+        open_archive = functools.partial(
+            open_archive_writer,
+            codec=codec,
+            level=level,
+            workers=workers,
+            block_frames=block_frames,
+            index=index,
+            output_format=output_format,
+            keep_every=keep_every,
+            executor=executor,
+        )
+        self.ring = None
+        self.rotator = None
+        if rotate_seconds or rotate_bytes:
+            self.archive = None
+            self.rotator = RotatingArchiveWriter(
+                open_archive,
+                tar_path,
+                rotate_seconds,
+                rotate_bytes,
+                self.encoder,
+                self.frame_log,
+            )
+            self.writer = self.rotator
+        elif ring_seconds:
+            self.archive = None
+            self.ring = RingBufferWriter(
+                open_archive,
+                tar_path,
+                ring_seconds,
+                post_seconds,
+                self.encoder,
+                ring_frames,
+                queue_size,
+            )
+            self.writer = self.ring
+        else:
+            self.archive = open_archive(tar_path)
+            self.writer = self.archive
+            if self.encoder is not None:
+                # Encoding runs wherever add_frame runs, so after the queue if any
+                self.writer = EncodingArchiveWriter(self.writer, self.encoder)
+        self.background_writer = background_writer
+        self.queue_writer = None
+        release = self.pool.release if self.pool else None
+        if executor is not None and codec != "pgzip":
+            # pgzip already compresses on the pool; anything else would run on
+            # the event thread shared by all sources
+            self.background_writer = True
+            self.writer = PooledArchiveWriter(
+                self.writer, executor, queue_size, release
+            )
+            self.queue_writer = self.writer
+        elif background_writer:
+            self.writer = BackgroundArchiveWriter(self.writer, queue_size, release)
+            self.queue_writer = self.writer
+
+    @property
+    def archives(self):
+        """Archive writers opened so far (several in ring or rotation mode)."""
+        if self.ring is not None:
+            return self.ring.archives
+        if self.rotator is not None:
+            return self.rotator.archives
+        return [self.archive]
 
     def on_closed(self, event):
         """Triggered on CLOSE_WRITE - when frame is complete"""
         if event.src_path != str(self.source):
             return
+        self.capture_frame()
+
+    def on_moved(self, event):
+        """A frame written elsewhere and renamed into place is complete too"""
+        if event.dest_path != str(self.source):
+            return
+        self.capture_frame()
+
+    def read_frame(self):
+        """Read the source file, retrying while it looks half-written.
+
+        The file is stat'ed before and after the read; a changed size or
+        mtime, or a FITS block structure that does not add up, means the
+        writer was already rewriting it. Returns None if every attempt was
+        torn.
+        """
+        for attempt in range(self.read_retries + 1):
+            if attempt:
+                time.sleep(self.retry_delay)
+            with open(self.source, "rb", buffering=0) as f:
+                before = os.fstat(f.fileno())
+                if self.pool is None:
+                    data = f.read()
+                else:
+                    data = self._read_into_pool(f, before.st_size)
+                after = os.fstat(f.fileno())
+            # Identifies this version of the file, for is_duplicate
+            self.read_stat = (after.st_ino, after.st_mtime_ns, after.st_size)
+            if not self.verify:
+                return data
+
+            if (before.st_size, before.st_mtime_ns) != (
+                after.st_size,
+                after.st_mtime_ns,
+            ):
+                problem = "file changed during read"
+            elif len(data) != after.st_size:
+                problem = f"read {len(data)} of {after.st_size} bytes"
+            else:
+                problem = check_frame(data)
+            if problem is None:
+                return data
+            self.torn_reads += 1
+            if self.pool is not None:
+                self.pool.release(data)
 
+        self.torn_frames += 1
+        self.last_torn = problem
+        if not self.quiet:
+            print(f"Torn frame skipped: {problem}")
+        return None
+
+    def _read_into_pool(self, f, size):
+        # One spare byte so a file that grew since fstat shows up as a size mismatch
+        buf = self.pool.acquire(size + 1)
+        view = memoryview(buf)
+        n = 0
+        while n < len(view):
+            count = f.readinto(view[n:])
+            if not count:
+                break
+            n += count
+        return view[:n]
+
+    def frame_times(self, data, received):
+        """Header exposure time (or None) and frame counter (or None) of a frame."""
+        values = read_keywords(data, self.header_keywords)
+        header_time = header_timestamp(values, self.time_keywords)
+        counter = next(
+            (values[kw] for kw in self.counter_keywords if kw in values), None
+        )
+        if header_time is not None:
+            latency = received - header_time
+            self.header_timed += 1
+            self.latency_total += latency
+            if self.latency_max is None or latency > self.latency_max:
+                self.latency_max = latency
+        return header_time, counter
+
+    def is_duplicate(self, data, counter):
+        """Whether a frame is the previous one read again.
+
+        Judged by the frame counter when the header has an integer one.
+        Without one, only the same unchanged file (inode, mtime and size as at
+        the last read) holding the same bytes counts: header times alone
+        repeat for distinct frames when the camera clock is coarse.
+        """
+        if isinstance(counter, int):
+            duplicate = counter == self._last_counter
+            self._last_counter = counter
+            self._last_read = None
+            return duplicate
+        self._last_counter = None
+        read = (self.read_stat, bytes(data))
+        duplicate = read == self._last_read
+        self._last_read = read
+        return duplicate
+
+    def capture_frame(self):
+        """Archive the current content of the source file as one frame."""
+        received_ns = time.monotonic_ns()
+        received = time.time()
+        self.arrivals.add(received_ns)
         if self.start_time is None:
             self.start_time = time.time()
             print("First frame detected - starting capture!\n")
 
         elapsed = time.time() - self.start_time
 
-        if elapsed > self.duration:
+        if self.duration and elapsed > self.duration:
             self.stop_observer = True
             return
 
-        timestamp = datetime.now(timezone.utc).strftime("%Y%m%d_%H%M%S_%f")
-        filename = f"{self.source.stem}_{timestamp}.fits"
-
         try:
-            # Read file content
-            with open(self.source, "rb") as f:
-                file_data = f.read()
+            file_data = self.read_frame()
+            if file_data is None:
+                return
 
-            # Create tarinfo
-            tarinfo = tarfile.TarInfo(name=filename)
-            tarinfo.size = len(file_data)
-            tarinfo.mtime = time.time()
+            # Name and time frames by exposure, falling back to arrival time
+            header_time, counter = self.frame_times(file_data, received)
+            if self.is_duplicate(file_data, counter):
+                # The same camera frame read again (a spurious or merged event)
+                self.duplicates += 1
+                if self.pool is not None:
+                    self.pool.release(file_data)
+                return
+            frame_time = received if header_time is None else header_time
+            missing = self.gaps.update(counter, frame_time)
+            if missing:
+                self.last_gap = (missing, frame_time)
+                if not self.quiet:
+                    print(
+                        f"Gap: {missing} frame(s) missing before "
+                        f"{format_utc(frame_time)}"
+                    )
+            timestamp = datetime.fromtimestamp(frame_time, timezone.utc).strftime(
+                "%Y%m%d_%H%M%S_%f"
+            )
+            filename = f"{self.source.stem}_{timestamp}.fits"
+            if timestamp == self._last_timestamp:
+                # A new frame (by its counter) but a coarse header clock did
+                # not advance; keep member names unique
+                self._repeats += 1
+                filename = f"{self.source.stem}_{timestamp}_{self._repeats}.fits"
+            else:
+                self._last_timestamp = timestamp
+                self._repeats = 0
+            if self.seeing is not None:
+                self.seeing.add_frame(file_data, frame_time)
 
-            # Add to tar.gz
-            self.tar_file.addfile(tarinfo, io.BytesIO(file_data))
+            accepted = self.writer.add_frame(filename, file_data, frame_time, counter)
+            if self.pool is not None and not (accepted and self.background_writer):
+                self.pool.release(file_data)
+            if not accepted:
+                return
+            if self.frame_log is not None:
+                # After add_frame, so a rotation it triggers comes first
+                self.frame_log.write(
+                    (
+                        filename,
+                        "" if header_time is None else f"{header_time:.6f}",
+                        "" if counter is None else counter,
+                        f"{received:.6f}",
+                        received_ns,
+                    )
+                )
 
             self.copy_count += 1
-
-            if self.copy_count % 50 == 0:
-                rate = self.copy_count / elapsed if elapsed > 0 else 0
-                print(f"Captured {self.copy_count} frames ({rate:.1f} Hz)")
         except Exception as e:
             print(f"Capture error: {e}")
 
     def close(self):
-        """Close the tar file"""
-        if self.tar_file:
-            self.tar_file.close()
+        """Close the archive, waiting for any queued frames to be written"""
+        self.writer.close()
+        if self.seeing is not None:
+            self.seeing.close()
+        if self.frame_log is not None:
+            self.frame_log.close()
+
+
+class CaptureStatus:
+    """Dashboard lines for a capture, from the handler's counters.
+
+    Rates, jitter and archive throughput are over the time since the
+    previous call, so at the dashboard refresh rate.
+    """
+
+    def __init__(self, handler, codec=None):
+        self.handler = handler
+        self.codec = codec
+        self._last_ns = time.monotonic_ns()
+        self._last_arrivals = handler.arrivals.snapshot()
+        self._last_bytes = 0
+
+    def sample(self):
+        """Rate, interval, jitter, archived MB and MB/s since the last sample."""
+        now_ns = time.monotonic_ns()
+        seconds = (now_ns - self._last_ns) / 1e9
+        arrivals = self.handler.arrivals.snapshot()
+        events, interval, jitter = interval_stats(self._last_arrivals, arrivals)
+        archived = sum(archive.bytes_in for archive in self.handler.archives)
+        mb_s = (archived - self._last_bytes) / (1024 * 1024) / seconds
+        self._last_ns, self._last_arrivals, self._last_bytes = (
+            now_ns,
+            arrivals,
+            archived,
+        )
+        return events / seconds, interval, jitter, archived / (1024 * 1024), mb_s
+
+    def line(self, label):
+        """One line per source, for the multi-source dashboard."""
+        handler = self.handler
+        rate, interval, jitter, archived_mb, mb_s = self.sample()
+        line = f"{label}: {handler.copy_count} frames, {rate:6.1f} Hz"
+        if jitter is not None:
+            line += f", jitter {jitter:6.3f} ms"
+        dropped = handler.gaps.dropped + handler.torn_frames
+        if handler.queue_writer is not None:
+            writer = handler.queue_writer
+            dropped += writer.dropped
+            line += f", queue {writer.queue.qsize()}/{writer.max_queue}"
+        line += f", {dropped} dropped, {archived_mb:.1f} MB at {mb_s:.2f} MB/s"
+        if handler.last_gap is not None:
+            line += f", last gap {format_utc(handler.last_gap[1])[11:19]}"
+        return line
+
+    def lines(self):
+        handler = self.handler
+        rate, interval, jitter, archived_mb, mb_s = self.sample()
+
+        frames = f"Frames: {handler.copy_count} captured, {rate:6.1f} Hz"
+        if interval is not None:
+            frames += f", interval {interval:6.2f} ms"
+        if jitter is not None:
+            frames += f", jitter {jitter:6.3f} ms"
+        gaps = handler.gaps
+        queue_full = handler.queue_writer.dropped if handler.queue_writer else 0
+        drops = (
+            f"Dropped: {gaps.dropped} in {gaps.gap_count} gaps, "
+            f"{handler.torn_frames} torn, {queue_full} queue full, "
+            f"{handler.duplicates} duplicate reads"
+        )
+        queues = []
+        if handler.queue_writer is not None:
+            writer = handler.queue_writer
+            queues.append(f"writer {writer.queue.qsize()}/{writer.max_queue}")
+        if handler.seeing is not None:
+            seeing = handler.seeing
+            queues.append(f"seeing {seeing.queue.qsize()}/{seeing.queue.maxsize}")
+        lines = [frames, drops]
+        last = []
+        if handler.last_gap is not None:
+            missing, frame_time = handler.last_gap
+            last.append(f"gap of {missing} before {format_utc(frame_time)[11:]}")
+        if handler.last_torn is not None:
+            last.append(f"torn frame ({handler.last_torn})")
+        if last:
+            lines.append(f"Last: {', '.join(last)}")
+        if queues:
+            lines.append(f"Queues: {', '.join(queues)}")
+        lines.append(
+            f"Archive: {archived_mb:.1f} MB in, "
+            f"{mb_s:.2f} MB/s ({self.codec})"
+        )
+        if handler.seeing is not None and handler.seeing.latest is not None:
+            estimate = handler.seeing.latest
+            lines.append(
+                f"Seeing: {estimate.seeing:.2f}\" (r0 {estimate.r0 * 100:.1f} cm) "
+                f"at {format_utc(estimate.time)[11:19]}"
+            )
+        return lines
+
+
+def output_size(path):
+    """Bytes on disk of an archive file, or of everything in an output directory."""
+    path = Path(path)
+    if path.is_dir():
+        return sum(p.stat().st_size for p in path.rglob("*") if p.is_file())
+    return path.stat().st_size
+
+
+def combined_throughput_mb_s(archives):
+    """Overall uncompressed MB/s of several archive writers."""
+    total_mb = 0.0
+    busy_seconds = 0.0
+    for archive in archives:
+        mb = archive.bytes_in / (1024 * 1024)
+        throughput = archive.throughput_mb_s()
+        if throughput > 0:
+            total_mb += mb
+            busy_seconds += mb / throughput
+    return total_mb / busy_seconds if busy_seconds > 0 else 0.0
 
 
 def capture_dimm_to_tar(
-    source_file: str, output_file: str, duration_seconds: float = 5.0
+    source_file: str,
+    output_file: str,
+    duration_seconds: float = 5.0,
+    background_writer: bool = False,
+    queue_size: int = 256,
+    codec: str = "gzip",
+    level: int = None,
+    workers: int = None,
+    block_frames: int = 16,
+    index: bool = False,
+    output_format: str = "tar",
+    frame_encoding: str = "raw",
+    keyframe_interval: int = 100,
+    keep_every: int = None,
+    backend: str = "watchdog",
+    verify: bool = True,
+    read_retries: int = 3,
+    zero_copy: bool = False,
+    ring_seconds: float = None,
+    post_seconds: float = 10.0,
+    ring_frames: int = None,
+    trigger_file: str = None,
+    trigger_socket: str = None,
+    rotate_minutes: float = None,
+    rotate_mb: float = None,
+    time_keywords=TIME_KEYWORDS,
+    counter_keywords=COUNTER_KEYWORDS,
+    frame_log: bool = True,
+    expected_rate: float = None,
+    seeing: bool = False,
+    pixel_scale: float = None,
+    aperture: float = None,
+    baseline: float = None,
+    wavelength: float = DEFAULT_WAVELENGTH,
+    seeing_interval: float = 10.0,
+    status_hz: float = 2.0,
 ):
-    """Capture DIMM frames directly to tar.gz archive."""
+    """Capture DIMM frames directly to tar.gz archive.
+
+    With ``background_writer`` the event callback only queues the frame bytes
+    and a separate thread compresses them into the archive. ``codec`` selects
+    the archive compression (none, gzip, zstd or lz4) and ``level`` its level.
+    The ``pgzip`` codec compresses blocks of ``block_frames`` frames on a pool
+    of ``workers`` threads, and with ``index`` also writes a sidecar frame
+    index for random access (see ``dimm_archive.py``). ``output_format="cube"``
+    stacks the pixel data into a memory-mapped cube instead of a tar archive;
+    ``output_format="centroids"`` stores only per-frame spot measurements in
+    a columnar directory, plus every ``keep_every``-th full frame if given.
+    ``frame_encoding="rice"`` Rice-codes the pixel data of each frame before
+    it reaches the archive codec; ``"delta"`` stores a keyframe every
+    ``keyframe_interval`` frames and XOR deltas in between.
+
+    ``backend`` selects how CLOSE_WRITE is detected: watchdog's observer, or
+    a direct inotify watch on the source file (Linux only).
+
+    With ``verify`` each read is checked for a complete FITS structure and
+    retried up to ``read_retries`` times if the file was torn mid-rewrite;
+    frames that never read cleanly are skipped and counted. ``zero_copy``
+    reads frames into a pool of reusable buffers that are passed to the
+    archive writer without intermediate copies.
+
+    With ``ring_seconds`` nothing is archived until a trigger fires: the last
+    ``ring_seconds`` of frames (at most ``ring_frames``) are kept in memory
+    and, on SIGUSR1, creation of ``trigger_file`` or a ``trigger`` command on
+    the ``trigger_socket`` Unix socket, written with the next
+    ``post_seconds`` of frames to a new timestamped archive named after
+    ``output_file``. A ``duration_seconds`` of 0 runs until interrupted.
+
+    With ``rotate_minutes`` and/or ``rotate_mb`` every frame is archived, but
+    into a new timestamped archive each time the current one reaches that
+    age or size; combined with ``duration_seconds=0`` this is the daemon
+    mode for all-night capture. SIGTERM stops the capture cleanly.
+
+    Frames are named and timed by the first of ``time_keywords`` found in
+    their FITS header (falling back to the arrival time). With ``frame_log``
+    a ``<output>.frames.csv`` log records, per frame, the header time, the
+    first of ``counter_keywords`` found, and the wall-clock and monotonic
+    receive times; it rotates with the archives, and a ring buffer keeps
+    none. Dropped frames are detected from jumps in the counter,
+    or else from arrival gaps against ``expected_rate`` (Hz, estimated from
+    the data if not given), and reported live and in the summary.
+
+    With ``seeing`` the two DIMM spots are centroided in every frame on a
+    separate thread and a seeing estimate is printed, and logged to
+    ``<output>.seeing.csv``, every ``seeing_interval`` seconds. This needs
+    the ``pixel_scale`` (arcsec/pixel) and the sub-aperture ``aperture`` and
+    ``baseline`` (metres); ``wavelength`` is in metres.
+
+    Progress is shown as a status block (rate, jitter, drops, queue depths,
+    archive throughput) redrawn ``status_hz`` times a second from counters
+    the capture path updates; 0 turns it off. While it is shown, gaps and
+    torn frames are only counted, with the latest of each in the block,
+    instead of printed one line each.
+    """
     source = Path(source_file)
 
     if not source.exists():
@@ -80,51 +772,350 @@ def capture_dimm_to_tar(
 
     print(f"Monitoring: {source}")
     print(f"Output archive: {tar_path}")
-    print(f"Duration: {duration_seconds}s")
-    print(f"Capturing on: CLOSE_WRITE (complete frames)")
+    print(f"Duration: {duration_seconds}s" if duration_seconds else "Duration: unlimited")
+    print(f"Capturing on: CLOSE_WRITE (complete frames) via {backend}")
+    if background_writer:
+        print(f"Writer: background thread (queue size {queue_size})")
+
+    event_handler = DimmTarCaptureHandler(
+        source,
+        tar_path,
+        duration_seconds,
+        background_writer=background_writer,
+        queue_size=queue_size,
+        codec=codec,
+        level=level,
+        workers=workers,
+        block_frames=block_frames,
+        index=index,
+        output_format=output_format,
+        frame_encoding=frame_encoding,
+        keyframe_interval=keyframe_interval,
+        keep_every=keep_every,
+        verify=verify,
+        read_retries=read_retries,
+        zero_copy=zero_copy,
+        ring_seconds=ring_seconds,
+        post_seconds=post_seconds,
+        ring_frames=ring_frames,
+        rotate_seconds=rotate_minutes * 60 if rotate_minutes else None,
+        rotate_bytes=rotate_mb * 1024 * 1024 if rotate_mb else None,
+        time_keywords=time_keywords,
+        counter_keywords=counter_keywords,
+        frame_log=frame_log,
+        expected_rate=expected_rate,
+        seeing=seeing,
+        pixel_scale=pixel_scale,
+        aperture=aperture,
+        baseline=baseline,
+        wavelength=wavelength,
+        seeing_interval=seeing_interval,
+    )
+    if event_handler.archive is not None:
+        codec_label = event_handler.archive.codec_label
+    else:
+        codec_label = codec
+    print(f"Codec: {codec_label}")
+    if frame_encoding != "raw":
+        print(f"Frame encoding: {frame_encoding}")
+    if seeing:
+        print(
+            f"Seeing: every {seeing_interval}s, {pixel_scale}\"/pixel, "
+            f"D={aperture} m, B={baseline} m, {wavelength * 1e9:.0f} nm"
+        )
+
+    ring = event_handler.ring
+    listener = None
+    if ring is not None:
+        print(f"Ring buffer: {ring_seconds}s pre-trigger, {post_seconds}s post-trigger")
+        signal.signal(signal.SIGUSR1, lambda signum, frame: ring.trigger())
+        triggers = ["SIGUSR1"]
+        if trigger_file:
+            triggers.append(f"creating {trigger_file}")
+        if trigger_socket:
+            listener = TriggerSocketListener(trigger_socket, ring.trigger)
+            triggers.append(f"'trigger' on {trigger_socket}")
+        print(f"Trigger with: {', '.join(triggers)}")
+    if event_handler.rotator is not None:
+        limits = []
+        if rotate_minutes:
+            limits.append(f"{rotate_minutes} min")
+        if rotate_mb:
+            limits.append(f"{rotate_mb} MB")
+        print(f"Rotating archives every {' or '.join(limits)}")
+
+    def stop_on_sigterm(signum, frame):
+        event_handler.stop_observer = True
+
+    signal.signal(signal.SIGTERM, stop_on_sigterm)
     print(f"Waiting for frames...\n")
 
-    event_handler = DimmTarCaptureHandler(source, tar_path, duration_seconds)
-    observer = Observer()
-    observer.schedule(event_handler, str(source.parent), recursive=False)
+    if backend == "inotify":
+        observer = InotifyFileWatcher(source, event_handler.capture_frame)
+    else:
+        if Observer is None:
+            raise RuntimeError("watchdog backend requires the 'watchdog' package")
+        observer = Observer()
+        observer.schedule(event_handler, str(source.parent), recursive=False)
     observer.start()
 
+    dashboard = StatusDashboard(status_hz) if status_hz else None
+    event_handler.quiet = dashboard is not None
+    status = CaptureStatus(event_handler, codec_label)
     try:
-        while not event_handler.stop_observer:
-            time.sleep(0.1)
+        with dashboard or contextlib.nullcontext():
+            while not event_handler.stop_observer:
+                time.sleep(0.1)
+                if ring is not None and trigger_file and os.path.exists(trigger_file):
+                    os.unlink(trigger_file)
+                    ring.trigger()
+                if dashboard is not None and dashboard.due():
+                    dashboard.draw(status.lines())
+                start_time = event_handler.start_time
+                if duration_seconds and start_time:
+                    # Also stop if the source went quiet after the duration
+                    if time.time() - start_time > duration_seconds:
+                        break
     except KeyboardInterrupt:
         print("\nStopped by user")
     finally:
         observer.stop()
         observer.join()
+        if listener is not None:
+            listener.close()
         event_handler.close()  # Close tar file
 
-    if event_handler.start_time:
-        elapsed = time.time() - event_handler.start_time
-        rate = event_handler.copy_count / elapsed if elapsed > 0 else 0
+    print(f"\n{'='*50}")
+    captured = print_capture_summary(event_handler, time.time())
+    print(f"{'='*50}")
+    if not captured:
+        return None
+    if ring is not None or event_handler.rotator is not None:
+        return [archive.tar_path for archive in event_handler.archives]
+    return tar_path
+
 
-        # Get final archive size
-        archive_size_mb = Path(tar_path).stat().st_size / (1024 * 1024)
-        uncompressed_mb = event_handler.copy_count * 26 / 1024
-        compression_ratio = (
-            uncompressed_mb / archive_size_mb if archive_size_mb > 0 else 0
-        )
+def remove_capture_outputs(handler):
+    """Delete the archives, indexes and logs of a capture that got no frames."""
+    for archive in handler.archives:
+        if Path(archive.tar_path).is_dir():
+            shutil.rmtree(archive.tar_path)
+        Path(archive.tar_path).unlink(missing_ok=True)  # Remove empty archive
+        index_path_for(archive.tar_path).unlink(missing_ok=True)
+    if handler.frame_log is not None:
+        for path in handler.frame_log.paths:
+            Path(path).unlink(missing_ok=True)
+    Path(f"{handler.tar_path}{SEEING_LOG_SUFFIX}").unlink(missing_ok=True)
+
+
+def print_capture_summary(handler, end_time):
+    """Print the summary of one source's capture, ended at ``end_time``.
+
+    A source that never saw a frame has its empty outputs removed instead.
+    Returns whether any frame was captured. Used for each source of a
+    multi-source capture as well.
+    """
+    if handler.start_time is None:
+        print(f"⚠️  No frames captured from {handler.source}")
+        remove_capture_outputs(handler)
+        return False
+    elapsed = end_time - handler.start_time
+    rate = handler.copy_count / elapsed if elapsed > 0 else 0
+
+    # Get final archive size
+    archives = handler.archives
+    archive_size_mb = sum(output_size(a.tar_path) for a in archives) / (1024 * 1024)
+    raw_bytes = (
+        handler.encoder.bytes_in
+        if handler.encoder
+        else sum(a.bytes_in for a in archives)
+    )
+    uncompressed_mb = raw_bytes / (1024 * 1024)
+    compression_ratio = uncompressed_mb / archive_size_mb if archive_size_mb > 0 else 0
 
-        print(f"\n{'='*50}")
-        print(f"Captured: {event_handler.copy_count} frames")
-        print(f"Duration: {elapsed:.3f}s")
-        print(f"Actual rate: {rate:.1f} Hz")
-        print(f"Archive size: {archive_size_mb:.2f} MB")
-        print(f"Uncompressed: {uncompressed_mb:.2f} MB")
-        print(f"Compression: {compression_ratio:.1f}x")
-        print(f"Saved to: {tar_path}")
-        print(f"{'='*50}")
+    print(f"Captured: {handler.copy_count} frames from {handler.source}")
+    print(f"Duration: {elapsed:.3f}s")
+    print(f"Actual rate: {rate:.1f} Hz")
+    if handler.ring is not None:
+        print(
+            f"Triggers: {handler.ring.triggers}, {handler.ring.archived_frames} "
+            f"frames archived in {len(archives)} archive(s)"
+        )
+        if handler.ring.dropped:
+            print(f"Dropped after a trigger (event queue full): {handler.ring.dropped}")
+    if handler.rotator is not None:
+        print(f"Archives: {len(archives)} ({handler.rotator.rotations} rotations)")
+    print(f"Archive size: {archive_size_mb:.2f} MB")
+    print(f"Uncompressed: {uncompressed_mb:.2f} MB")
+    print(f"Compression: {compression_ratio:.1f}x")
+    if archives:
+        print(
+            f"Codec throughput: {archives[0].codec_label} "
+            f"{combined_throughput_mb_s(archives):.1f} MB/s"
+        )
+    if handler.encoder:
+        handler.encoder.print_stats()
+    handler.gaps.print_stats(handler.copy_count)
+    if handler.seeing is not None:
+        handler.seeing.print_stats()
+    if handler.header_timed:
+        mean_latency = handler.latency_total / handler.header_timed
+        print(
+            f"Header times: {handler.header_timed} frames, receive "
+            f"latency mean {mean_latency * 1000:.1f} ms, "
+            f"max {handler.latency_max * 1000:.1f} ms"
+        )
     else:
-        print("\n⚠️  No frames captured")
-        Path(tar_path).unlink(missing_ok=True)  # Remove empty archive
+        print("Header times: none found, frames timed on arrival")
+    if handler.pool is not None:
+        print(f"Read buffers allocated: {handler.pool.allocations}")
+    if handler.verify:
+        print(
+            f"Torn frames: {handler.torn_frames} skipped, "
+            f"{handler.torn_reads} torn reads retried"
+        )
+    print(f"Duplicate reads skipped: {handler.duplicates}")
+    if handler.queue_writer is not None:
+        handler.queue_writer.print_stats()
+    if handler.frame_log is not None:
+        for path in handler.frame_log.paths:
+            print(f"Frame log: {path}")
+    if handler.seeing is not None:
+        print(f"Seeing log: {handler.tar_path}{SEEING_LOG_SUFFIX}")
+    for archive in archives:
+        print(f"Saved to: {archive.tar_path}")
+        if index_path_for(archive.tar_path).exists():
+            print(f"Frame index: {index_path_for(archive.tar_path)}")
+        if isinstance(archive, FrameCubeWriter):
+            print(f"Cube: {archive.count} x {archive.frame_shape} {archive.dtype}")
+        if isinstance(archive, CentroidTableWriter):
+            print(
+                f"Centroid table: {archive.count} rows, {archive.no_spots} "
+                f"without two spots, {archive.kept} full frames kept"
+            )
+    return True
+
+
+def capture_multiple_dimm_sources(
+    pairs,
+    duration_seconds: float = 5.0,
+    backend: str = "inotify",
+    workers: int = None,
+    status_hz: float = 2.0,
+    rotate_minutes: float = None,
+    rotate_mb: float = None,
+    **options,
+):
+    """Capture several DIMM frame files, each to its own archive, in one process.
+
+    ``pairs`` is a list of ``(source_file, output_file)``. All sources share
+    one event loop (one inotify descriptor and thread, or one watchdog
+    observer) and one pool of ``workers`` compression threads: with the
+    pgzip codec every archive submits its blocks to the pool, with any other
+    codec each source's frames are written by a ``PooledArchiveWriter``
+    task on it. Frames of one source are always written in order.
+
+    Archives rotate every ``rotate_minutes`` or ``rotate_mb`` as in
+    ``capture_dimm_to_tar``. The remaining ``options`` are passed to every
+    ``DimmTarCaptureHandler`` (codec, output format, frame log, seeing...).
+    The live status has one line per source, and the summary reports each
+    source as ``capture_dimm_to_tar`` does; sources that saw no frame have
+    their empty outputs removed. Capture stops ``duration_seconds`` after
+    the first frame from any source (0 runs until interrupted). Returns the
+    list of handlers.
+    """
+    sources = [Path(source) for source, _ in pairs]
+    missing = [source for source in sources if not source.exists()]
+    if missing:
+        for source in missing:
+            print(f"ERROR: File not found: {source}")
         return None
+    if len(set(sources)) < len(sources):
+        raise ValueError("Each source file can only be captured once")
 
-    return tar_path
+    workers = workers or os.cpu_count() or 1
+    executor = concurrent.futures.ThreadPoolExecutor(
+        max_workers=workers, thread_name_prefix="dimm-compress"
+    )
+    handlers = [
+        DimmTarCaptureHandler(
+            source,
+            output,
+            duration_seconds,
+            workers=workers,
+            executor=executor,
+            rotate_seconds=rotate_minutes * 60 if rotate_minutes else None,
+            rotate_bytes=rotate_mb * 1024 * 1024 if rotate_mb else None,
+            **options,
+        )
+        for source, (_, output) in zip(sources, pairs)
+    ]
+    for handler in handlers:
+        print(f"Monitoring: {handler.source} -> {handler.tar_path}")
+    print(
+        f"Duration: {duration_seconds}s" if duration_seconds else "Duration: unlimited"
+    )
+    print(f"Capturing on: CLOSE_WRITE (complete frames) via {backend}")
+    print(f"Compression pool: {workers} threads, codec {options.get('codec', 'gzip')}")
+
+    stop = threading.Event()
+    signal.signal(signal.SIGTERM, lambda signum, frame: stop.set())
+    print(f"Waiting for frames...\n")
+
+    if backend == "inotify":
+        observer = InotifyMultiFileWatcher(
+            {handler.source: handler.capture_frame for handler in handlers}
+        )
+    else:
+        if Observer is None:
+            raise RuntimeError("watchdog backend requires the 'watchdog' package")
+        observer = Observer()
+        for handler in handlers:
+            # Sources in one directory share a watch; handlers filter by path
+            observer.schedule(handler, str(handler.source.parent), recursive=False)
+    observer.start()
+
+    dashboard = StatusDashboard(status_hz) if status_hz else None
+    for handler in handlers:
+        handler.quiet = dashboard is not None
+    statuses = [CaptureStatus(handler) for handler in handlers]
+    names = [source.name for source in sources]
+    labels = names if len(set(names)) == len(names) else [str(s) for s in sources]
+    start_time = None
+    try:
+        with dashboard or contextlib.nullcontext():
+            while not stop.is_set():
+                time.sleep(0.1)
+                if dashboard is not None and dashboard.due():
+                    dashboard.draw(
+                        [status.line(label) for status, label in zip(statuses, labels)]
+                    )
+                if all(handler.stop_observer for handler in handlers):
+                    break
+                starts = [h.start_time for h in handlers if h.start_time]
+                start_time = min(starts) if starts else None
+                if duration_seconds and start_time:
+                    if time.time() - start_time > duration_seconds:
+                        break
+    except KeyboardInterrupt:
+        print("\nStopped by user")
+    finally:
+        observer.stop()
+        observer.join()
+        for handler in handlers:
+            handler.close()
+        executor.shutdown()
+
+    end_time = time.time()
+    print(f"\n{'='*50}")
+    total = sum(handler.copy_count for handler in handlers)
+    elapsed = end_time - start_time if start_time else 0.0
+    print(f"Captured: {total} frames from {len(handlers)} sources in {elapsed:.3f}s")
+    for handler in handlers:
+        print()
+        print_capture_summary(handler, end_time)
+    print(f"{'='*50}")
+    return handlers
 
 
 if __name__ == "__main__":
@@ -135,24 +1126,297 @@ if __name__ == "__main__":
         "-i",
         "--input",
         required=True,
-        help="Input FITS file to monitor (e.g., /dimm/dimm/image/dimm_tool/boxframe.fits)",
+        action="append",
+        help="Input FITS file to monitor (e.g., /dimm/dimm/image/dimm_tool/boxframe.fits), "
+        "repeat -i and -o to capture several cameras in one process",
     )
     parser.add_argument(
         "-o",
         "--output",
         required=True,
-        help="Output tar.gz archive file path (e.g., dimm_data.tar.gz)",
+        action="append",
+        help="Output tar.gz archive file path (e.g., dimm_data.tar.gz), one per input",
+    )
+    parser.add_argument(
+        "--backend",
+        choices=BACKENDS,
+        default="watchdog",
+        help="File event backend; 'inotify' watches the file directly with "
+        "lower latency (Linux only, default: watchdog)",
+    )
+    parser.add_argument(
+        "--no-verify",
+        dest="verify",
+        action="store_false",
+        help="Archive frames without checking for torn (half-written) FITS files",
+    )
+    parser.add_argument(
+        "--read-retries",
+        type=int,
+        default=3,
+        help="Re-reads of a torn frame before it is skipped (default: 3)",
+    )
+    parser.add_argument(
+        "--time-keyword",
+        action="append",
+        dest="time_keywords",
+        help="FITS header keyword holding the exposure time; repeat to try "
+        f"several in order (default: {', '.join(TIME_KEYWORDS)})",
+    )
+    parser.add_argument(
+        "--counter-keyword",
+        action="append",
+        dest="counter_keywords",
+        help="FITS header keyword holding the frame counter; repeat to try "
+        f"several in order (default: {', '.join(COUNTER_KEYWORDS)})",
+    )
+    parser.add_argument(
+        "--expected-rate",
+        type=float,
+        default=None,
+        help="Camera frame rate in Hz for gap detection when frames carry no "
+        "counter (default: estimated from arrival times)",
+    )
+    parser.add_argument(
+        "--seeing",
+        action="store_true",
+        help="Estimate seeing live from the spot motion; needs --pixel-scale, "
+        "--aperture and --baseline",
+    )
+    parser.add_argument(
+        "--pixel-scale", type=float, help="Plate scale in arcsec per pixel"
+    )
+    parser.add_argument(
+        "--aperture", type=float, help="Sub-aperture diameter in metres"
+    )
+    parser.add_argument(
+        "--baseline", type=float, help="Sub-aperture separation in metres"
+    )
+    parser.add_argument(
+        "--wavelength",
+        type=float,
+        default=DEFAULT_WAVELENGTH * 1e9,
+        help="Effective wavelength in nm (default: 500)",
+    )
+    parser.add_argument(
+        "--seeing-interval",
+        type=float,
+        default=10.0,
+        help="Seconds of frames per seeing estimate (default: 10.0)",
+    )
+    parser.add_argument(
+        "--status-hz",
+        type=float,
+        default=2.0,
+        help="Refresh rate of the live status display, 0 to turn it off and "
+        "print each gap and torn frame instead (default: 2)",
+    )
+    parser.add_argument(
+        "--no-frame-log",
+        dest="frame_log",
+        action="store_false",
+        help="Do not write the per-frame timing log <output>.frames.csv "
+        "(never written with --ring-seconds)",
+    )
+    parser.add_argument(
+        "--zero-copy",
+        action="store_true",
+        help="Read frames into reusable buffers and archive them without copies",
+    )
+    parser.add_argument(
+        "--format",
+        choices=OUTPUT_FORMATS,
+        default="tar",
+        help="Write a tar archive, a memory-mapped pixel cube, or only spot "
+        "measurements in a columnar directory (default: tar)",
+    )
+    parser.add_argument(
+        "--keep-every",
+        type=int,
+        default=None,
+        help="With --format centroids, also archive every Nth full frame "
+        "(using --codec) for QA",
     )
     parser.add_argument(
         "-d",
         "--duration",
         type=float,
         default=30.0,
-        help="Duration in seconds to capture frames (default: 30.0)",
+        help="Duration in seconds to capture frames, 0 to run until "
+        "interrupted (default: 30.0)",
+    )
+    parser.add_argument(
+        "--daemon",
+        action="store_true",
+        help="Run until stopped (SIGINT/SIGTERM), rotating archives; implies "
+        "--duration 0 and --rotate-minutes 60 unless a rotation limit is given",
+    )
+    parser.add_argument(
+        "--rotate-minutes",
+        type=float,
+        default=None,
+        help="Start a new timestamped archive after this many minutes",
+    )
+    parser.add_argument(
+        "--rotate-mb",
+        type=float,
+        default=None,
+        help="Start a new timestamped archive once the current one reaches this size",
+    )
+    parser.add_argument(
+        "--ring-seconds",
+        type=float,
+        default=None,
+        help="Keep this many seconds of frames in memory and archive them only "
+        "when triggered (SIGUSR1, --trigger-file or --trigger-socket)",
+    )
+    parser.add_argument(
+        "--ring-frames",
+        type=int,
+        default=None,
+        help="Upper bound on frames held in the ring buffer",
+    )
+    parser.add_argument(
+        "--post-seconds",
+        type=float,
+        default=10.0,
+        help="Seconds of frames archived after a trigger (default: 10.0)",
+    )
+    parser.add_argument(
+        "--trigger-file",
+        help="Trigger when this file is created (it is removed again)",
+    )
+    parser.add_argument(
+        "--trigger-socket",
+        help="Unix socket path accepting 'trigger' commands",
+    )
+
+    parser.add_argument(
+        "--frame-encoding",
+        choices=FRAME_ENCODINGS,
+        default="raw",
+        help="Per-frame encoding before archiving; 'rice' Rice-codes the pixels "
+        "(lossless, integer images), best combined with --codec none; 'delta' "
+        "stores keyframes and XOR deltas (default: raw)",
+    )
+    parser.add_argument(
+        "--keyframe-interval",
+        type=int,
+        default=100,
+        help="Frames between keyframes for --frame-encoding delta (default: 100)",
+    )
+    parser.add_argument(
+        "--codec",
+        choices=CODECS,
+        default="gzip",
+        help="Archive compression codec (default: gzip)",
+    )
+    parser.add_argument(
+        "--level",
+        type=int,
+        default=None,
+        help="Compression level (default: gzip 9, zstd 3, lz4 0, pgzip 6)",
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=None,
+        help="Compression threads for the pgzip codec, or shared by all inputs "
+        "when capturing several (default: CPU count)",
+    )
+    parser.add_argument(
+        "--block-frames",
+        type=int,
+        default=16,
+        help="Frames per independently compressed pgzip block (default: 16)",
+    )
+    parser.add_argument(
+        "--index",
+        action="store_true",
+        help="Write a sidecar frame index for random access (pgzip codec only; "
+        "with --format centroids, for the kept full frames)",
+    )
+    parser.add_argument(
+        "--background-writer",
+        action="store_true",
+        help="Compress frames on a separate writer thread fed by a bounded queue",
+    )
+    parser.add_argument(
+        "--queue-size",
+        type=int,
+        default=256,
+        help="Maximum frames waiting for the background writer (default: 256)",
     )
 
     args = parser.parse_args()
+    package = CODEC_PACKAGES.get(args.codec)
+    if package is not None:
+        try:
+            importlib.import_module(package)
+        except ImportError:
+            parser.error(f"--codec {args.codec} requires the '{package}' package")
+    if args.index and args.codec != "pgzip":
+        parser.error("--index requires --codec pgzip")
+    if args.index and args.format == "cube":
+        parser.error("--index does not apply to --format cube")
+    if args.format != "tar" and args.frame_encoding != "raw":
+        parser.error(f"--format {args.format} reads pixels and needs --frame-encoding raw")
+    if args.keep_every and args.format != "centroids":
+        parser.error("--keep-every requires --format centroids")
+    if args.daemon:
+        args.duration = 0
+        if not (args.rotate_minutes or args.rotate_mb):
+            args.rotate_minutes = 60.0
+    if args.ring_seconds and (args.rotate_minutes or args.rotate_mb):
+        parser.error("--ring-seconds cannot be combined with archive rotation")
+    if args.seeing and None in (args.pixel_scale, args.aperture, args.baseline):
+        parser.error("--seeing requires --pixel-scale, --aperture and --baseline")
+    if len(args.input) != len(args.output):
+        parser.error("Give one -o/--output per -i/--input")
 
-    capture_dimm_to_tar(
-        source_file=args.input, output_file=args.output, duration_seconds=args.duration
+    options = dict(
+        duration_seconds=args.duration,
+        backend=args.backend,
+        workers=args.workers,
+        status_hz=args.status_hz,
+        background_writer=args.background_writer,
+        queue_size=args.queue_size,
+        codec=args.codec,
+        level=args.level,
+        block_frames=args.block_frames,
+        index=args.index,
+        output_format=args.format,
+        frame_encoding=args.frame_encoding,
+        keyframe_interval=args.keyframe_interval,
+        keep_every=args.keep_every,
+        verify=args.verify,
+        read_retries=args.read_retries,
+        zero_copy=args.zero_copy,
+        rotate_minutes=args.rotate_minutes,
+        rotate_mb=args.rotate_mb,
+        time_keywords=args.time_keywords or TIME_KEYWORDS,
+        counter_keywords=args.counter_keywords or COUNTER_KEYWORDS,
+        frame_log=args.frame_log,
+        expected_rate=args.expected_rate,
+        seeing=args.seeing,
+        pixel_scale=args.pixel_scale,
+        aperture=args.aperture,
+        baseline=args.baseline,
+        wavelength=args.wavelength * 1e-9,
+        seeing_interval=args.seeing_interval,
     )
+    if len(args.input) > 1:
+        if args.ring_seconds:
+            parser.error("--ring-seconds is not supported with several inputs")
+        capture_multiple_dimm_sources(list(zip(args.input, args.output)), **options)
+    else:
+        capture_dimm_to_tar(
+            args.input[0],
+            args.output[0],
+            ring_seconds=args.ring_seconds,
+            post_seconds=args.post_seconds,
+            ring_frames=args.ring_frames,
+            trigger_file=args.trigger_file,
+            trigger_socket=args.trigger_socket,
+            **options,
+        )
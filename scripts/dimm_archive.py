@@ -0,0 +1,396 @@
+#!/usr/bin/env python3
+"""Readers for DIMM capture outputs.
+
+Archives written by ``copy_and_tar_dimm_data.py --codec pgzip --index`` are
+ordinary tar.gz files made of independent gzip members, plus a sidecar CSV
+index (``<archive>.idx``) giving, for every frame, the compressed offset and
+length of the member holding it and where the frame sits once decompressed.
+Any frame can then be fetched with one seek and one member decompression.
+
+Frames written with ``--frame-encoding delta`` are stored as keyframes plus
+XOR deltas (members ending in ``.xor``) against the previous frame;
+``decode_delta_frames`` and ``SeekableFrameArchive`` undo the encoding.
+With ``--frame-encoding rice`` (members ending in ``.rice``) the pixel
+data is Rice-coded and the header zlib-compressed; ``decode_rice_frame``
+restores the original FITS bytes, and the readers here do so on the fly.
+
+Captures written with ``--format cube`` are a raw N x H x W pixel file plus a
+parallel float64 timestamp file and a small JSON description, loaded here as
+zero-copy ``np.memmap`` arrays.
+
+Captures written with ``--format centroids`` are a directory holding one
+raw little-endian file per measurement column (``<column>.bin``) and a
+``schema.json``; ``load_centroid_table`` maps the columns, and full frames
+kept for QA are in an ordinary tar archive alongside.
+"""
+import argparse
+import bisect
+import csv
+import json
+import math
+import struct
+import tarfile
+import zlib
+from pathlib import Path
+
+from dimm_fits import BLOCK_SIZE
+
+INDEX_SUFFIX = ".idx"
+INDEX_FIELDS = ("name", "timestamp", "offset", "length", "data_offset", "size")
+
+DELTA_SUFFIX = ".xor"
+
+RICE_SUFFIX = ".rice"
+# Format version, bytes per pixel, padded header length, packed header
+# length, data length
+RICE_PREFIX = struct.Struct("<BBIII")
+RICE_VERSION = 1
+RICE_BLOCKSIZE = 32
+
+CUBE_META_SUFFIX = ".json"
+CUBE_TIMES_SUFFIX = ".times"
+
+
+def index_path_for(archive_path):
+    """Sidecar index path for an archive."""
+    return Path(str(archive_path) + INDEX_SUFFIX)
+
+
+def write_index_header(f):
+    """Start a new index file and return a csv writer for its rows."""
+    writer = csv.writer(f)
+    writer.writerow(INDEX_FIELDS)
+    return writer
+
+
+def read_index(index_path):
+    """Load an index file into a list of row dicts with typed values."""
+    with open(index_path, newline="") as f:
+        rows = list(csv.DictReader(f))
+    for row in rows:
+        row["timestamp"] = float(row["timestamp"])
+        for key in ("offset", "length", "data_offset", "size"):
+            row[key] = int(row[key])
+    return rows
+
+
+def xor_bytes(a, b):
+    """XOR two equal-length byte strings."""
+    n = len(a)
+    return (int.from_bytes(a, "little") ^ int.from_bytes(b, "little")).to_bytes(
+        n, "little"
+    )
+
+
+def decode_delta_frames(members):
+    """Undo delta encoding on ``(name, data)`` pairs given in archive order.
+
+    Keyframes pass through unchanged; ``.xor`` members are XORed with the
+    previously decoded frame and yielded under their original name.
+    """
+    previous = None
+    for name, data in members:
+        if name.endswith(DELTA_SUFFIX):
+            if previous is None:
+                raise ValueError(f"Delta frame {name} has no preceding keyframe")
+            data = xor_bytes(previous, data)
+            name = name[: -len(DELTA_SUFFIX)]
+        previous = data
+        yield name, data
+
+
+def rice_codec():
+    """The ``imagecodecs`` module, which provides the Rice (RCOMP) codec.
+
+    Its output for one whole-frame tile is the same as fpack's and FITS tile
+    compression's Rice coding.
+    """
+    try:
+        import imagecodecs
+    except ImportError:
+        raise RuntimeError("rice frame encoding requires the 'imagecodecs' package")
+    return imagecodecs
+
+
+def decode_rice_frame(data):
+    """Rebuild the FITS file bytes of a ``.rice`` member."""
+    version, bytepix, header_length, packed, length = RICE_PREFIX.unpack_from(data)
+    if version != RICE_VERSION:
+        raise ValueError(f"unknown Rice frame format version {version}")
+    start = RICE_PREFIX.size
+    header = zlib.decompress(data[start : start + packed])
+    if len(header) != header_length:
+        raise ValueError("Rice frame header is corrupt")
+    pixels = rice_codec().rcomp_decode(
+        data[start + packed :],
+        shape=(length // bytepix,),
+        dtype=f"i{bytepix}",
+        nblock=RICE_BLOCKSIZE,
+    )
+    padding = b"\0" * (-length % BLOCK_SIZE)
+    return header + pixels.astype(f">i{bytepix}").tobytes() + padding
+
+
+def decode_rice_member(name, data):
+    """``(name, data)`` of a stored member with any Rice encoding undone."""
+    if name.endswith(RICE_SUFFIX):
+        return name[: -len(RICE_SUFFIX)], decode_rice_frame(data)
+    return name, data
+
+
+def iter_tar_frames(archive_path):
+    """Yield ``(name, data)`` for every frame of a tar archive, in order.
+
+    Works for any codec tarfile can read and decodes delta- and
+    Rice-encoded frames.
+    """
+
+    def members():
+        with tarfile.open(archive_path, "r:*") as tar:
+            for member in tar:
+                if member.isfile():
+                    data = tar.extractfile(member).read()
+                    yield decode_rice_member(member.name, data)
+
+    return decode_delta_frames(members())
+
+
+class SeekableFrameArchive:
+    """Fetch individual frames or time ranges from an indexed archive."""
+
+    def __init__(self, archive_path, index_path=None):
+        self.archive_path = Path(archive_path)
+        self.index = read_index(index_path or index_path_for(archive_path))
+        self.names = [row["name"] for row in self.index]
+        self.timestamps = [row["timestamp"] for row in self.index]
+        self._by_name = {name: i for i, name in enumerate(self.names)}
+        self._file = open(self.archive_path, "rb")
+        self._cached_offset = None
+        self._cached_block = None
+
+    def __len__(self):
+        return len(self.index)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        if self._file:
+            self._file.close()
+            self._file = None
+
+    def _block(self, offset, length):
+        # Consecutive frames usually share a block, so keep the last one
+        if offset != self._cached_offset:
+            self._file.seek(offset)
+            self._cached_block = zlib.decompress(self._file.read(length), wbits=31)
+            self._cached_offset = offset
+        return self._cached_block
+
+    def entry(self, key):
+        """Index row of a frame given its position or member name."""
+        return self.index[self._by_name[key] if isinstance(key, str) else key]
+
+    def _stored_frame(self, i):
+        row = self.index[i]
+        block = self._block(row["offset"], row["length"])
+        return block[row["data_offset"] : row["data_offset"] + row["size"]]
+
+    def read_frame(self, key):
+        """Return the bytes of a frame given its position or member name.
+
+        Delta-encoded frames are rebuilt from the preceding keyframe, and
+        Rice-encoded ones decoded.
+        """
+        i = self._by_name[key] if isinstance(key, str) else key
+        if i < 0:
+            i += len(self.index)
+        start = i
+        while self.names[start].endswith(DELTA_SUFFIX):
+            if start == 0:
+                raise ValueError(f"Delta frame {self.names[i]} has no keyframe")
+            start -= 1
+        data = self._stored_frame(start)
+        for j in range(start + 1, i + 1):
+            data = xor_bytes(data, self._stored_frame(j))
+        return decode_rice_member(self.names[i], data)[1]
+
+    def frame_range(self, start_time, end_time):
+        """Positions of frames with ``start_time <= timestamp < end_time``."""
+        lo = bisect.bisect_left(self.timestamps, start_time)
+        hi = bisect.bisect_left(self.timestamps, end_time)
+        return range(lo, hi)
+
+    def read_time_range(self, start_time, end_time):
+        """Yield ``(name, timestamp, bytes)`` for frames in a time range."""
+        for i in self.frame_range(start_time, end_time):
+            yield self.names[i], self.timestamps[i], self.read_frame(i)
+
+
+def cube_paths(cube_path):
+    """Metadata and timestamp file paths belonging to a frame cube."""
+    return (
+        Path(str(cube_path) + CUBE_META_SUFFIX),
+        Path(str(cube_path) + CUBE_TIMES_SUFFIX),
+    )
+
+
+def write_cube_metadata(cube_path, dtype, frame_shape, count):
+    """Describe a frame cube so it can be mapped without parsing any FITS."""
+    meta_path, _ = cube_paths(cube_path)
+    meta = {"dtype": dtype, "frame_shape": list(frame_shape), "count": count}
+    meta_path.write_text(json.dumps(meta, indent=2) + "\n")
+
+
+CENTROID_SCHEMA = "schema.json"
+CENTROID_COLUMN_SUFFIX = ".bin"
+# One row per frame; spot 1 is the one with the smaller x
+CENTROID_COLUMNS = (
+    ("time", "<f8"),
+    ("counter", "<i8"),
+    ("background", "<f4"),
+    ("noise", "<f4"),
+    ("x1", "<f4"),
+    ("y1", "<f4"),
+    ("flux1", "<f4"),
+    ("width1", "<f4"),
+    ("x2", "<f4"),
+    ("y2", "<f4"),
+    ("flux2", "<f4"),
+    ("width2", "<f4"),
+)
+
+
+def centroid_column_path(table_path, column):
+    """File holding one column of a centroid table."""
+    return Path(table_path) / f"{column}{CENTROID_COLUMN_SUFFIX}"
+
+
+def write_centroid_schema(table_path, count, **attributes):
+    """Describe a centroid table's columns, row count and capture settings."""
+    schema = {
+        "columns": [{"name": name, "dtype": dtype} for name, dtype in CENTROID_COLUMNS],
+        "count": count,
+        **attributes,
+    }
+    path = Path(table_path) / CENTROID_SCHEMA
+    path.write_text(json.dumps(schema, indent=2) + "\n")
+
+
+def load_centroid_table(table_path, mode="r"):
+    """Map a centroid table as ``(columns, schema)``.
+
+    ``columns`` maps each column name to an ``np.memmap`` of its values.
+    The row count is taken from the column files, so a table whose capture
+    was killed before writing the final schema still loads, up to the last
+    complete row.
+    """
+    import numpy as np
+
+    schema = json.loads((Path(table_path) / CENTROID_SCHEMA).read_text())
+    columns = [(c["name"], np.dtype(c["dtype"])) for c in schema["columns"]]
+    count = min(
+        centroid_column_path(table_path, name).stat().st_size // dtype.itemsize
+        for name, dtype in columns
+    )
+    table = {}
+    for name, dtype in columns:
+        if count == 0:
+            table[name] = np.empty(0, dtype=dtype)
+        else:
+            table[name] = np.memmap(
+                centroid_column_path(table_path, name),
+                dtype=dtype,
+                mode=mode,
+                shape=(count,),
+            )
+    return table, schema
+
+
+def load_frame_cube(cube_path, mode="r"):
+    """Map a frame cube as ``(frames, timestamps)`` NumPy memmaps.
+
+    ``frames`` has shape (N, H, W) and ``timestamps`` shape (N,), in Unix
+    seconds. Nothing is read until the arrays are accessed. As for centroid
+    tables, N is taken from the file sizes, so a cube whose capture was
+    killed still loads, up to the last complete frame.
+    """
+    import numpy as np
+
+    meta_path, times_path = cube_paths(cube_path)
+    meta = json.loads(meta_path.read_text())
+    frame_bytes = np.dtype(meta["dtype"]).itemsize * math.prod(meta["frame_shape"])
+    count = min(
+        times_path.stat().st_size // 8, Path(cube_path).stat().st_size // frame_bytes
+    )
+    if count == 0:
+        shape = (0, *meta["frame_shape"])
+        return np.empty(shape, dtype=meta["dtype"]), np.empty(0)
+    frames = np.memmap(
+        cube_path, dtype=meta["dtype"], mode=mode, shape=(count, *meta["frame_shape"])
+    )
+    timestamps = np.memmap(times_path, dtype=np.float64, mode=mode, shape=(count,))
+    return frames, timestamps
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Inspect or extract frames from an indexed DIMM archive."
+    )
+    parser.add_argument(
+        "archive",
+        help="Archive written with --codec pgzip --index, or a --format "
+        "centroids directory",
+    )
+    parser.add_argument(
+        "-x",
+        "--extract",
+        help="Frame position or member name to extract",
+    )
+    parser.add_argument(
+        "-o",
+        "--output",
+        help="Output file for --extract (default: member name), or CSV export "
+        "of a centroid table",
+    )
+
+    args = parser.parse_args()
+
+    if Path(args.archive).is_dir():
+        table, schema = load_centroid_table(args.archive)
+        rows = len(table["time"])
+        print(f"Rows: {rows} (schema says {schema['count']})")
+        if rows:
+            print(f"Span: {table['time'][-1] - table['time'][0]:.3f}s")
+        print(f"Columns: {', '.join(table)}")
+        for key, value in schema.items():
+            if key not in ("columns", "count"):
+                print(f"{key}: {value}")
+        if args.output:
+            with open(args.output, "w", newline="") as f:
+                writer = csv.writer(f)
+                writer.writerow(table)
+                writer.writerows(zip(*(column.tolist() for column in table.values())))
+            print(f"Wrote {rows} rows to {args.output}")
+        raise SystemExit
+
+    with SeekableFrameArchive(args.archive) as archive:
+        if args.extract is None:
+            print(f"Frames: {len(archive)}")
+            if len(archive):
+                span = archive.timestamps[-1] - archive.timestamps[0]
+                print(f"First: {archive.names[0]}")
+                print(f"Last: {archive.names[-1]}")
+                print(f"Span: {span:.3f}s")
+        else:
+            key = int(args.extract) if args.extract.isdigit() else args.extract
+            data = archive.read_frame(key)
+            name = archive.entry(key)["name"]
+            # Frames come out decoded, so drop the encoding suffix
+            name = name.removesuffix(DELTA_SUFFIX).removesuffix(RICE_SUFFIX)
+            output = args.output or name
+            Path(output).write_bytes(data)
+            print(f"Wrote {len(data)} bytes to {output}")
@@ -0,0 +1,139 @@
+"""Live terminal status for the capture and monitor scripts.
+
+The code handling each frame only bumps counters (``EventCounter`` or plain
+integer attributes); the main loop renders them into a few lines and hands
+them to a ``StatusDashboard`` at a low, fixed rate. Each counter is written
+by one thread only, so a reader on another thread sees at worst a value one
+event stale, and nothing is formatted or printed per frame.
+"""
+import shutil
+import sys
+import threading
+import time
+from collections import namedtuple
+
+CounterSnapshot = namedtuple(
+    "CounterSnapshot", "count intervals interval_sum interval_sq_sum"
+)
+
+# Refresh interval when stdout is a file or pipe rather than a terminal
+LOG_REFRESH_SECONDS = 10.0
+
+
+class EventCounter:
+    """Count events and sum their intervals, for rates and jitter.
+
+    ``add`` costs a few integer additions. Intervals are summed in integer
+    nanoseconds, so differences between two ``snapshot``s are exact however
+    long the run.
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.intervals = 0
+        self.interval_sum = 0
+        self.interval_sq_sum = 0
+        self._last_ns = None
+
+    def add(self, now_ns):
+        if self._last_ns is not None:
+            interval = now_ns - self._last_ns
+            self.intervals += 1
+            self.interval_sum += interval
+            self.interval_sq_sum += interval * interval
+        self._last_ns = now_ns
+        self.count += 1
+
+    def snapshot(self):
+        return CounterSnapshot(
+            self.count, self.intervals, self.interval_sum, self.interval_sq_sum
+        )
+
+
+def interval_stats(before, after):
+    """Events, mean interval and jitter (ms) between two snapshots.
+
+    The interval mean and standard deviation are None with fewer than one
+    and two intervals respectively.
+    """
+    events = after.count - before.count
+    n = after.intervals - before.intervals
+    if n < 1:
+        return events, None, None
+    mean = (after.interval_sum - before.interval_sum) / n
+    if n < 2:
+        return events, mean / 1e6, None
+    sq = (after.interval_sq_sum - before.interval_sq_sum) / n
+    variance = max(0.0, sq - mean * mean) * n / (n - 1)
+    return events, mean / 1e6, variance**0.5 / 1e6
+
+
+class StatusDashboard:
+    """A block of status lines kept at the bottom of the terminal.
+
+    Call ``draw`` from the main loop whenever ``due()``; on a terminal the
+    block is redrawn in place at ``refresh_hz``. While the dashboard is
+    entered as a context manager it stands in for ``sys.stdout``, so
+    anything printed meanwhile (from any thread) scrolls up above the block
+    instead of tearing it. Lines are cut to the terminal width, as a
+    wrapped line would throw off the redraw. When stdout is not a terminal
+    the block is printed as plain lines every ``LOG_REFRESH_SECONDS``
+    instead.
+    """
+
+    def __init__(self, refresh_hz=2.0, stream=None):
+        self.stream = stream or sys.stdout
+        self.live = self.stream.isatty()
+        period = 1.0 / refresh_hz if self.live else LOG_REFRESH_SECONDS
+        self.period_ns = int(period * 1e9)
+        self.next_ns = 0
+        self._drawn = 0
+        self._line_start = True
+        self._lock = threading.Lock()
+        self._saved_stdout = None
+
+    def __enter__(self):
+        self._saved_stdout = sys.stdout
+        sys.stdout = self
+        return self
+
+    def __exit__(self, *exc):
+        sys.stdout = self._saved_stdout
+
+    def due(self, now_ns=None):
+        now_ns = time.monotonic_ns() if now_ns is None else now_ns
+        return now_ns >= self.next_ns
+
+    def draw(self, lines):
+        with self._lock:
+            self.next_ns = time.monotonic_ns() + self.period_ns
+            self._erase()
+            if not self._line_start:
+                self.stream.write("\n")
+                self._line_start = True
+            if self.live:
+                width = shutil.get_terminal_size().columns - 1
+                lines = [line[:width] for line in lines]
+                self._drawn = len(lines)
+            self.stream.write("".join(f"{line}\n" for line in lines))
+            if not self.live:
+                self.stream.write("\n")
+            self.stream.flush()
+
+    def _erase(self):
+        if self._drawn:
+            # Back to the first line of the block and clear to the end of screen
+            self.stream.write(f"\x1b[{self._drawn}F\x1b[J")
+            self._drawn = 0
+
+    def write(self, text):
+        with self._lock:
+            self._erase()
+            self._line_start = text.endswith("\n") if text else self._line_start
+            return self.stream.write(text)
+
+    def flush(self):
+        self.stream.flush()
+
+    def isatty(self):
+        return self.live
@@ -0,0 +1,143 @@
+#!/usr/bin/env python3
+"""Compact binary log of file events, and its decoder.
+
+``measure_dimm_update_rate.py --binary-log`` appends one fixed-size record
+per inotify event instead of printing a line: the monotonic time in ns at
+which the event batch was read, the event mask and the rename cookie.
+Records are packed into a preallocated buffer and written out in batches.
+
+The file starts with a header holding the wall-clock and monotonic times
+at which the log was opened, so monotonic event times can be converted to
+UTC afterwards. ``read_event_log`` loads a log as a NumPy structured array.
+"""
+import argparse
+import csv
+import struct
+import time
+from pathlib import Path
+
+from dimm_inotify import event_names
+
+EVENT_LOG_MAGIC = b"DIMMEVT1"
+EVENT_LOG_VERSION = 1
+# magic, version, record size, wall-clock ns and monotonic ns at open
+_HEADER = struct.Struct("<8sIIqq")
+# monotonic ns, mask, cookie
+_RECORD = struct.Struct("<QII")
+EVENT_LOG_DTYPE = [("monotonic_ns", "<u8"), ("mask", "<u4"), ("cookie", "<u4")]
+
+
+class EventLogWriter:
+    """Append event records to ``path``, ``batch_records`` per write."""
+
+    def __init__(self, path, batch_records=4096):
+        self.path = Path(path)
+        self.records = 0
+        self._file = open(path, "wb")
+        self._file.write(
+            _HEADER.pack(
+                EVENT_LOG_MAGIC,
+                EVENT_LOG_VERSION,
+                _RECORD.size,
+                time.time_ns(),
+                time.monotonic_ns(),
+            )
+        )
+        self._buffer = bytearray(batch_records * _RECORD.size)
+        self._view = memoryview(self._buffer)
+        self._offset = 0
+
+    def append(self, monotonic_ns, mask, cookie=0):
+        _RECORD.pack_into(self._buffer, self._offset, monotonic_ns, mask, cookie)
+        self._offset += _RECORD.size
+        self.records += 1
+        if self._offset == len(self._buffer):
+            self.flush()
+
+    def flush(self):
+        """Write the buffered records out."""
+        if self._offset:
+            self._file.write(self._view[: self._offset])
+            self._offset = 0
+        self._file.flush()
+
+    def close(self):
+        self.flush()
+        self._file.close()
+
+
+def read_event_log(path):
+    """Load an event log as ``(events, header)``.
+
+    ``events`` is a structured array with ``monotonic_ns``, ``mask`` and
+    ``cookie`` fields; ``header`` holds the ``version`` and the
+    ``realtime_ns``/``monotonic_ns`` pair taken when the log was opened. A
+    partial record at the end (from a killed monitor) is ignored.
+    """
+    import numpy as np
+
+    path = Path(path)
+    with open(path, "rb") as f:
+        magic, version, record_size, realtime_ns, monotonic_ns = _HEADER.unpack(
+            f.read(_HEADER.size)
+        )
+    if magic != EVENT_LOG_MAGIC:
+        raise ValueError(f"{path} is not a DIMM event log")
+    if record_size != np.dtype(EVENT_LOG_DTYPE).itemsize:
+        raise ValueError(f"Unsupported record size {record_size} in {path}")
+    count = (path.stat().st_size - _HEADER.size) // record_size
+    events = np.fromfile(
+        path, dtype=EVENT_LOG_DTYPE, count=count, offset=_HEADER.size
+    )
+    header = {
+        "version": version,
+        "realtime_ns": realtime_ns,
+        "monotonic_ns": monotonic_ns,
+    }
+    return events, header
+
+
+def unix_times(events, header):
+    """Event times in Unix seconds, from the clock pair in the log header."""
+    offset_ns = header["realtime_ns"] - header["monotonic_ns"]
+    return (events["monotonic_ns"].astype("i8") + offset_ns) / 1e9
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Summarize or export a DIMM event log."
+    )
+    parser.add_argument(
+        "log", help="Log written by measure_dimm_update_rate.py --binary-log"
+    )
+    parser.add_argument("-o", "--output", help="Export the events to this CSV file")
+
+    args = parser.parse_args()
+    import numpy as np
+
+    events, header = read_event_log(args.log)
+    print(f"Events: {len(events)}")
+    if len(events):
+        span = (int(events["monotonic_ns"][-1]) - int(events["monotonic_ns"][0])) / 1e9
+        print(f"Span: {span:.3f}s")
+        for mask in np.unique(events["mask"]):
+            times = events["monotonic_ns"][events["mask"] == mask]
+            label = ",".join(event_names(int(mask))) or "UNKNOWN"
+            line = f"  {label:15s} {len(times):8d}"
+            if len(times) > 1:
+                intervals = np.diff(times) / 1e6
+                line += (
+                    f"  interval p50 {np.median(intervals):7.2f}  "
+                    f"p99 {np.percentile(intervals, 99):7.2f}  "
+                    f"max {intervals.max():7.2f} ms"
+                )
+            print(line)
+    if args.output:
+        with open(args.output, "w", newline="") as f:
+            writer = csv.writer(f)
+            writer.writerow(("unix_time", "monotonic_ns", "event", "cookie"))
+            times = unix_times(events, header).tolist()
+            for when, (monotonic_ns, mask, cookie) in zip(times, events.tolist()):
+                label = ",".join(event_names(mask)) or "UNKNOWN"
+                writer.writerow((f"{when:.6f}", monotonic_ns, label, cookie))
+        print(f"Wrote {len(events)} events to {args.output}")
@@ -0,0 +1,175 @@
+"""Minimal FITS primary-HDU helpers for DIMM frames.
+
+Only what the capture path needs: a fast header parser that stops at the END
+card, a lookup of a few keywords that stops as soon as they are found, and
+conversion of the primary data array to NumPy. astropy is not required.
+"""
+from datetime import datetime, timezone
+
+BLOCK_SIZE = 2880
+CARD_SIZE = 80
+
+# Header keywords tried, in order, for the exposure time and frame counter
+TIME_KEYWORDS = ("DATE-OBS", "DATE-BEG", "MJD-OBS")
+COUNTER_KEYWORDS = ("FRAMENUM", "FRAMENO", "FRAME", "IMGNUM")
+
+MJD_UNIX_EPOCH = 40587.0
+
+BITPIX_DTYPES = {8: "u1", 16: ">i2", 32: ">i4", 64: ">i8", -32: ">f4", -64: ">f8"}
+
+
+def _parse_value(text):
+    text = text.strip()
+    if text.startswith("'"):
+        end = text.find("'", 1)
+        while end != -1 and text[end + 1 : end + 2] == "'":
+            end = text.find("'", end + 2)
+        return text[1:end].replace("''", "'").rstrip()
+    value = text.split("/", 1)[0].strip()
+    if value == "T":
+        return True
+    if value == "F":
+        return False
+    try:
+        return int(value)
+    except ValueError:
+        pass
+    try:
+        return float(value.replace("D", "E"))
+    except ValueError:
+        return value
+
+
+def parse_header(data):
+    """Parse the primary header of a FITS file held in ``data``.
+
+    Returns ``(header, header_length)`` where ``header`` maps keywords to
+    values and ``header_length`` is the size in bytes including padding to
+    the 2880-byte block boundary. Raises ValueError if no END card is found.
+    """
+    header = {}
+    view = memoryview(data)
+    for offset in range(0, len(data) - CARD_SIZE + 1, CARD_SIZE):
+        card = bytes(view[offset : offset + CARD_SIZE])
+        keyword = card[:8].rstrip().decode("ascii", "replace")
+        if keyword == "END":
+            end = offset + CARD_SIZE
+            return header, end + (-end % BLOCK_SIZE)
+        if card[8:10] == b"= ":
+            header[keyword] = _parse_value(card[10:].decode("ascii", "replace"))
+    raise ValueError("FITS header has no END card")
+
+
+def read_keywords(data, keywords):
+    """Values of the given header keywords, without parsing the rest.
+
+    Scans cards only until every keyword has been seen or END is reached.
+    Missing keywords are left out of the returned dict.
+    """
+    wanted = {kw.encode("ascii").ljust(8): kw for kw in keywords}
+    found = {}
+    view = memoryview(data)
+    for offset in range(0, len(data) - CARD_SIZE + 1, CARD_SIZE):
+        key = bytes(view[offset : offset + 8])
+        if key in wanted:
+            card = bytes(view[offset + 10 : offset + CARD_SIZE])
+            found[wanted[key]] = _parse_value(card.decode("ascii", "replace"))
+            if len(found) == len(wanted):
+                break
+        elif key == b"END     ":
+            break
+    return found
+
+
+def header_timestamp(values, keywords=TIME_KEYWORDS):
+    """Unix time from the first usable time keyword in ``values``, else None.
+
+    ISO dates (DATE-OBS style) are taken as UTC; MJD values are converted.
+    """
+    for keyword in keywords:
+        value = values.get(keyword)
+        if value is None:
+            continue
+        try:
+            if isinstance(value, (int, float)):
+                return (float(value) - MJD_UNIX_EPOCH) * 86400.0
+            when = datetime.fromisoformat(value)
+        except (TypeError, ValueError):
+            continue
+        if when.tzinfo is None:
+            when = when.replace(tzinfo=timezone.utc)
+        return when.timestamp()
+    return None
+
+
+def data_shape(header):
+    """NumPy-order shape of the primary data array (slowest axis first)."""
+    naxis = header.get("NAXIS", 0)
+    return tuple(header[f"NAXIS{i}"] for i in range(naxis, 0, -1))
+
+
+def data_length(header):
+    """Size in bytes of the primary data array, without block padding."""
+    shape = data_shape(header)
+    if not shape:
+        return 0
+    size = abs(header["BITPIX"]) // 8
+    for n in shape:
+        size *= n
+    return size
+
+
+def read_pixels(data, header=None, header_length=None):
+    """Return the primary data array of a FITS file held in ``data``.
+
+    Arrays stored with the FITS unsigned-integer convention (BZERO of
+    2**(BITPIX-1), BSCALE 1) come back as unsigned integers; other scaled
+    arrays are converted to float32, unscaled ones keep their stored type.
+    """
+    import numpy as np
+
+    if header is None:
+        header, header_length = parse_header(data)
+    bitpix = header["BITPIX"]
+    shape = data_shape(header)
+    stored = np.frombuffer(
+        data,
+        dtype=BITPIX_DTYPES[bitpix],
+        count=data_length(header) // (abs(bitpix) // 8),
+        offset=header_length,
+    ).reshape(shape)
+
+    bzero = header.get("BZERO", 0)
+    bscale = header.get("BSCALE", 1)
+    if bscale == 1 and bitpix > 8 and bzero == 2 ** (bitpix - 1):
+        # Flipping the sign bit maps the stored signed values onto unsigned
+        unsigned = stored.dtype.str.replace("i", "u")
+        sign_bit = np.array(1 << (bitpix - 1), dtype=unsigned)
+        return (stored.view(unsigned) ^ sign_bit).astype(unsigned[1:])
+    if bscale != 1 or bzero != 0:
+        return (stored * np.float32(bscale) + np.float32(bzero)).astype(np.float32)
+    return stored.astype(stored.dtype.str[1:])
+
+
+def check_frame(data):
+    """Check that ``data`` holds a complete single-HDU FITS file.
+
+    Returns None if the block structure is consistent, otherwise a short
+    reason: size not a multiple of 2880, no END card, or less data than
+    NAXIS/BITPIX require. Only the header is parsed.
+    """
+    if not data:
+        return "empty file"
+    if len(data) % BLOCK_SIZE:
+        return f"size {len(data)} not a multiple of {BLOCK_SIZE}"
+    try:
+        header, header_length = parse_header(data)
+    except ValueError:
+        return "no END card"
+    try:
+        expected = header_length + data_length(header)
+    except KeyError as e:
+        return f"missing {e.args[0]}"
+    if len(data) < expected:
+        return f"truncated data ({len(data)} < {expected} bytes)"
+    return None
@@ -0,0 +1,209 @@
+"""Minimal Linux inotify binding using ctypes.
+
+Used as a lower-latency alternative to watchdog: events are read straight
+from the inotify file descriptor, with no extra thread hop or event objects.
+"""
+import ctypes
+import ctypes.util
+import os
+import select
+import struct
+import threading
+from pathlib import Path
+
+IN_ACCESS = 0x00000001
+IN_MODIFY = 0x00000002
+IN_ATTRIB = 0x00000004
+IN_CLOSE_WRITE = 0x00000008
+IN_CLOSE_NOWRITE = 0x00000010
+IN_OPEN = 0x00000020
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_MOVE_SELF = 0x00000800
+IN_UNMOUNT = 0x00002000
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ISDIR = 0x40000000
+
+IN_NONBLOCK = os.O_NONBLOCK
+IN_CLOEXEC = os.O_CLOEXEC
+
+EVENT_NAMES = {
+    IN_ACCESS: "ACCESS",
+    IN_MODIFY: "MODIFY",
+    IN_ATTRIB: "ATTRIB",
+    IN_CLOSE_WRITE: "CLOSE_WRITE",
+    IN_CLOSE_NOWRITE: "CLOSE_NOWRITE",
+    IN_OPEN: "OPEN",
+    IN_MOVED_FROM: "MOVED_FROM",
+    IN_MOVED_TO: "MOVED_TO",
+    IN_CREATE: "CREATE",
+    IN_DELETE: "DELETE",
+    IN_DELETE_SELF: "DELETE_SELF",
+    IN_MOVE_SELF: "MOVE_SELF",
+    IN_UNMOUNT: "UNMOUNT",
+    IN_Q_OVERFLOW: "Q_OVERFLOW",
+    IN_IGNORED: "IGNORED",
+}
+
+_EVENT_HEADER = struct.Struct("iIII")  # wd, mask, cookie, len
+_READ_SIZE = 64 * 1024
+
+_libc = None
+
+
+def _load_libc():
+    global _libc
+    if _libc is None:
+        libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+        libc.inotify_init1.argtypes = [ctypes.c_int]
+        libc.inotify_add_watch.argtypes = [ctypes.c_int, ctypes.c_char_p, ctypes.c_uint32]
+        libc.inotify_rm_watch.argtypes = [ctypes.c_int, ctypes.c_int]
+        _libc = libc
+    return _libc
+
+
+def _check(result, what):
+    if result < 0:
+        errno = ctypes.get_errno()
+        raise OSError(errno, f"{what}: {os.strerror(errno)}")
+    return result
+
+
+def event_names(mask):
+    """Names of the event bits set in ``mask``, e.g. ``['CLOSE_WRITE']``."""
+    return [name for bit, name in EVENT_NAMES.items() if mask & bit]
+
+
+class Inotify:
+    """An inotify instance: add watches, then read batches of raw events."""
+
+    def __init__(self):
+        self._libc = _load_libc()
+        self.fd = _check(self._libc.inotify_init1(IN_CLOEXEC), "inotify_init1")
+        self._poll = select.poll()
+        self._poll.register(self.fd, select.POLLIN)
+
+    def fileno(self):
+        return self.fd
+
+    def add_watch(self, path, mask):
+        """Watch ``path`` for the events in ``mask``. Returns the watch descriptor."""
+        return _check(
+            self._libc.inotify_add_watch(self.fd, os.fsencode(path), mask),
+            f"inotify_add_watch({path})",
+        )
+
+    def rm_watch(self, wd):
+        self._libc.inotify_rm_watch(self.fd, wd)
+
+    def read_events(self, timeout=None):
+        """Wait up to ``timeout`` seconds and return the pending events.
+
+        Each event is a ``(wd, mask, cookie, name)`` tuple, ``name`` being the
+        raw bytes file name for directory watches and ``b""`` otherwise.
+        Returns an empty list on timeout.
+        """
+        if not self._poll.poll(None if timeout is None else timeout * 1000):
+            return []
+        buf = os.read(self.fd, _READ_SIZE)
+        events = []
+        offset = 0
+        while offset < len(buf):
+            wd, mask, cookie, length = _EVENT_HEADER.unpack_from(buf, offset)
+            offset += _EVENT_HEADER.size
+            name = buf[offset : offset + length].rstrip(b"\0")
+            offset += length
+            events.append((wd, mask, cookie, name))
+        return events
+
+    def close(self):
+        if self.fd >= 0:
+            os.close(self.fd)
+            self.fd = -1
+
+
+class InotifyMultiFileWatcher:
+    """Call ``callbacks[path]()`` each time a writer finishes a frame of ``path``.
+
+    Every file is watched for CLOSE_WRITE on one inotify descriptor, read by
+    one thread, so watching another camera costs a watch rather than a
+    thread; each event is dispatched with a dict lookup on its watch
+    descriptor. The directories are watched only for the files' names being
+    created or renamed into place: a rename (temp file + rename writers)
+    also completes a frame, and either case means the watch must move to
+    the new inode. Exposes ``start``/``stop``/``join`` like a watchdog
+    observer.
+    """
+
+    def __init__(self, callbacks, poll_interval=0.2):
+        self.poll_interval = poll_interval
+        self._inotify = Inotify()
+        self._callbacks = {}
+        self._file_wds = {}  # file watch descriptor -> path
+        self._watched = {}  # path -> file watch descriptor
+        self._dir_names = {}  # directory watch descriptor -> {file name: path}
+        for path, callback in callbacks.items():
+            path = Path(path)
+            self._callbacks[path] = callback
+            # Watching a directory twice returns the same descriptor
+            dir_wd = self._inotify.add_watch(path.parent, IN_CREATE | IN_MOVED_TO)
+            self._dir_names.setdefault(dir_wd, {})[os.fsencode(path.name)] = path
+            self._watch_file(path)
+        self._stop = threading.Event()
+        self._thread = threading.Thread(
+            target=self._run, name="dimm-inotify", daemon=True
+        )
+
+    def _watch_file(self, path):
+        old_wd = self._watched.pop(path, None)
+        if old_wd is not None:
+            del self._file_wds[old_wd]
+        try:
+            # Re-adding on the same inode just returns the existing descriptor
+            wd = self._inotify.add_watch(path, IN_CLOSE_WRITE)
+        except FileNotFoundError:
+            return
+        self._watched[path] = wd
+        self._file_wds[wd] = path
+
+    def start(self):
+        self._thread.start()
+
+    def _run(self):
+        read_events = self._inotify.read_events
+        callbacks = self._callbacks
+        file_wds = self._file_wds
+        dir_names = self._dir_names
+        while not self._stop.is_set():
+            for wd, mask, cookie, name in read_events(self.poll_interval):
+                path = file_wds.get(wd)
+                if path is not None:
+                    if mask & IN_CLOSE_WRITE:
+                        callbacks[path]()
+                elif wd in dir_names:
+                    path = dir_names[wd].get(name)
+                    if path is not None:
+                        self._watch_file(path)
+                        if mask & IN_MOVED_TO:
+                            callbacks[path]()
+
+    def stop(self):
+        self._stop.set()
+
+    def join(self):
+        if self._thread.is_alive():
+            self._thread.join()
+        self._inotify.close()
+
+
+class InotifyFileWatcher(InotifyMultiFileWatcher):
+    """Call ``callback()`` each time a writer finishes a frame of one file."""
+
+    def __init__(self, path, callback, poll_interval=0.2):
+        super().__init__({path: callback}, poll_interval)
+        self.path = Path(path)
+        self.callback = callback
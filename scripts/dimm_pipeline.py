@@ -0,0 +1,415 @@
+"""Writer wrappers that shape the stream of frames a capture archives.
+
+A background writer thread (or a shared pool) between the file events and
+the archive, a triggered ring buffer, rotation into a series of archives,
+and the per-frame log that follows them. Each wraps any ``dimm_writers``
+writer and has the same ``add_frame``/``close`` interface.
+"""
+import collections
+import csv
+import queue
+import threading
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+
+from dimm_encoders import EncodingArchiveWriter
+
+FRAME_LOG_SUFFIX = ".frames.csv"
+FRAME_LOG_FIELDS = (
+    "name",
+    "header_time",
+    "counter",
+    "receive_time",
+    "receive_monotonic_ns",
+)
+
+
+def timestamped_path(path, when):
+    """Insert a UTC timestamp before the extensions of ``path``.
+
+    ``dimm.tar.gz`` becomes ``dimm_20250101_031500_123.tar.gz``.
+    """
+    path = Path(path)
+    base, dot, ext = path.name.partition(".")
+    stamp = datetime.fromtimestamp(when, timezone.utc).strftime("%Y%m%d_%H%M%S_%f")
+    return path.with_name(f"{base}_{stamp[:-3]}{dot}{ext}")
+
+
+class FrameLog:
+    """CSV log of each archived frame's header time, counter and arrival.
+
+    ``open(path)`` starts a new log file and closes the previous one, so
+    rotated archives each get their own log. Rows written before the first
+    ``open`` are kept and go to the first file. Rows and rotation may come
+    from different threads.
+    """
+
+    def __init__(self, path=None):
+        self.paths = []
+        self._file = None
+        self._writer = None
+        self._pending = []
+        self._lock = threading.Lock()
+        if path is not None:
+            self.open(path)
+
+    def open(self, path):
+        f = open(path, "w", newline="")
+        writer = csv.writer(f)
+        writer.writerow(FRAME_LOG_FIELDS)
+        with self._lock:
+            previous = self._file
+            self._file, self._writer = f, writer
+            self.paths.append(path)
+            writer.writerows(self._pending)
+            self._pending = []
+        if previous is not None:
+            previous.close()
+
+    def write(self, row):
+        with self._lock:
+            if self._writer is None:
+                self._pending.append(row)
+            else:
+                self._writer.writerow(row)
+
+    def close(self):
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = self._writer = None
+
+
+class ArchiveSequence:
+    """Open a series of archives and finalize finished ones in the background.
+
+    ``open_archive(path)`` creates each archive writer. If ``encoder`` is
+    given it is reset for every archive and applied to its frames, so each
+    archive can be decoded on its own. A ``frame_log`` is moved on to a new
+    ``<archive>.frames.csv`` with each archive.
+    """
+
+    def __init__(self, open_archive, encoder=None, frame_log=None):
+        self.open_archive = open_archive
+        self.encoder = encoder
+        self.frame_log = frame_log
+        self.archives = []
+        self._finalizers = []
+
+    def open(self, path):
+        """Open the next archive and return the writer to add frames to."""
+        archive = self.open_archive(path)
+        self.archives.append(archive)
+        if self.frame_log is not None:
+            self.frame_log.open(f"{path}{FRAME_LOG_SUFFIX}")
+        if self.encoder is None:
+            return archive
+        self.encoder.reset()
+        return EncodingArchiveWriter(archive, self.encoder)
+
+    def finalize(self, writer):
+        """Close ``writer`` on a background thread."""
+        thread = threading.Thread(target=writer.close, name="dimm-archive-finalize")
+        thread.start()
+        self._finalizers.append(thread)
+
+    def join(self):
+        """Wait for every finalizing archive to be closed."""
+        for thread in self._finalizers:
+            thread.join()
+        self._finalizers = []
+
+
+class RingBufferWriter:
+    """Keep the last frames in memory and archive them only when triggered.
+
+    Frames older than ``pre_seconds`` (or beyond ``max_frames``) fall out of
+    the ring. ``trigger()`` - safe to call from a signal handler or another
+    thread - makes the next frame open a new timestamped archive named after
+    ``output_path``, flush the ring into it and keep archiving for
+    ``post_seconds``; a trigger during that window extends it. Each event
+    archive is written by its own ``BackgroundArchiveWriter``, so the
+    buffered frames are compressed off the calling thread; post-trigger
+    frames queue behind them (up to ``max_queue``, then they are dropped
+    and counted) and the archive is closed on a background thread too.
+
+    All times are frame times (``mtime``, the header exposure time when
+    there is one), so the event starts at the first frame after the trigger
+    rather than at the host clock time of the trigger, which may differ.
+    """
+
+    def __init__(
+        self,
+        open_archive,
+        output_path,
+        pre_seconds=10.0,
+        post_seconds=10.0,
+        encoder=None,
+        max_frames=None,
+        max_queue=256,
+    ):
+        self.sequence = ArchiveSequence(open_archive, encoder)
+        self.output_path = output_path
+        self.pre_seconds = pre_seconds
+        self.post_seconds = post_seconds
+        self.max_queue = max_queue
+        self.ring = collections.deque(maxlen=max_frames)
+        self.triggers = 0
+        self.archived_frames = 0
+        self.dropped = 0
+        self._requested = threading.Event()
+        self._writer = None
+        self._post_until = None
+
+    @property
+    def archives(self):
+        return self.sequence.archives
+
+    def trigger(self):
+        """Request that the ring and the following frames be archived."""
+        self._requested.set()
+
+    def add_frame(self, name, data, mtime, counter=None):
+        """Buffer one frame, or archive it while a trigger is active."""
+        if self._requested.is_set():
+            self._requested.clear()
+            self._start_event(mtime)
+
+        # Copy: the caller may reuse its buffer once we return
+        data = bytes(data)
+        if self._writer is not None:
+            if mtime <= self._post_until:
+                if not self._writer.add_frame(name, data, mtime, counter):
+                    self.dropped += 1
+                    return False
+                self.archived_frames += 1
+                return True
+            self.sequence.finalize(self._writer)
+            self._writer = None
+
+        self.ring.append((name, data, mtime, counter))
+        cutoff = mtime - self.pre_seconds
+        while self.ring[0][2] < cutoff:
+            self.ring.popleft()
+        return True
+
+    def _start_event(self, when):
+        self.triggers += 1
+        self._post_until = when + self.post_seconds
+        if self._writer is not None:
+            print(f"Trigger {self.triggers}: extending current archive")
+            return
+
+        if self.sequence.encoder is not None:
+            # The encoder is shared: let the last event finish with it
+            self.sequence.join()
+        path = timestamped_path(self.output_path, when)
+        print(f"Trigger {self.triggers}: {len(self.ring)} buffered frames -> {path}")
+        # Room for the whole ring, so only post-trigger frames can be dropped
+        self._writer = BackgroundArchiveWriter(
+            self.sequence.open(path), len(self.ring) + self.max_queue
+        )
+        while self.ring:
+            self._writer.add_frame(*self.ring.popleft())
+            self.archived_frames += 1
+
+    def close(self):
+        """Finish any active archive and wait for all archives to be closed."""
+        if self._writer is not None:
+            self.sequence.finalize(self._writer)
+            self._writer = None
+        self.sequence.join()
+
+
+class RotatingArchiveWriter:
+    """Write an unbounded stream of frames to a series of rotated archives.
+
+    A new timestamped archive named after ``output_path`` is started once
+    the current one is ``rotate_seconds`` old (by frame time) or has grown to
+    ``rotate_bytes`` (as its writer's ``bytes_written()`` counts them, so a
+    preallocated cube or a centroid directory rotates on its content). The
+    switch happens between two frames in the calling thread, so no frame is
+    lost, while the finished archive is closed on a background thread. A
+    ``frame_log`` is rotated along with the archives.
+    """
+
+    def __init__(
+        self,
+        open_archive,
+        output_path,
+        rotate_seconds=None,
+        rotate_bytes=None,
+        encoder=None,
+        frame_log=None,
+    ):
+        self.sequence = ArchiveSequence(open_archive, encoder, frame_log)
+        self.output_path = output_path
+        self.rotate_seconds = rotate_seconds
+        self.rotate_bytes = rotate_bytes
+        self.rotations = 0
+        self._writer = None
+        self._opened_at = None
+
+    @property
+    def archives(self):
+        return self.sequence.archives
+
+    def _due(self, mtime):
+        if self.rotate_seconds and mtime - self._opened_at >= self.rotate_seconds:
+            return True
+        if self.rotate_bytes:
+            return self.sequence.archives[-1].bytes_written() >= self.rotate_bytes
+        return False
+
+    def add_frame(self, name, data, mtime, counter=None):
+        """Add one frame, rotating to a new archive first if one is due."""
+        if self._writer is not None and self._due(mtime):
+            self.sequence.finalize(self._writer)
+            self._writer = None
+            self.rotations += 1
+        if self._writer is None:
+            path = timestamped_path(self.output_path, mtime)
+            self._writer = self.sequence.open(path)
+            self._opened_at = mtime
+            if self.rotations:
+                print(f"Rotated to {path}")
+        return self._writer.add_frame(name, data, mtime, counter)
+
+    def close(self):
+        """Close the current archive and wait for all archives to be closed."""
+        if self._writer is not None:
+            self.sequence.finalize(self._writer)
+            self._writer = None
+        self.sequence.join()
+
+
+class BackgroundArchiveWriter:
+    """Hand frames to a dedicated writer thread through a bounded queue.
+
+    The event callback only pays for a ``put_nowait``; compression happens on
+    the writer thread. When the queue is full the frame is dropped and counted
+    rather than stalling the event dispatch thread.
+
+    If ``release`` is given it is called with each frame's data once the
+    writer thread is done with it (used to recycle pooled read buffers).
+    """
+
+    def __init__(self, writer, max_queue=256, release=None):
+        self.writer = writer
+        self.release = release
+        self.queue = queue.Queue(maxsize=max_queue)
+        self.max_queue = max_queue
+        self.enqueued = 0
+        self.dropped = 0
+        self.write_errors = 0
+        self.max_depth = 0
+        self.enqueue_seconds_total = 0.0
+        self.enqueue_seconds_max = 0.0
+        self._start()
+
+    def _start(self):
+        self._thread = threading.Thread(
+            target=self._drain, name="dimm-archive-writer", daemon=True
+        )
+        self._thread.start()
+
+    def add_frame(self, name, data, mtime, counter=None):
+        """Queue one frame. Returns False if it was dropped."""
+        t0 = time.perf_counter()
+        try:
+            self.queue.put_nowait((name, data, mtime, counter))
+        except queue.Full:
+            self.dropped += 1
+            return False
+        dt = time.perf_counter() - t0
+
+        self.enqueued += 1
+        self.enqueue_seconds_total += dt
+        self.enqueue_seconds_max = max(self.enqueue_seconds_max, dt)
+        self.max_depth = max(self.max_depth, self.queue.qsize())
+        return True
+
+    def _drain(self):
+        while True:
+            item = self.queue.get()
+            if item is None:
+                break
+            self._write(item)
+
+    def _write(self, item):
+        try:
+            self.writer.add_frame(*item)
+        except Exception as e:
+            self.write_errors += 1
+            print(f"Archive write error: {e}")
+        if self.release is not None:
+            self.release(item[1])
+
+    def close(self):
+        """Flush the queue, stop the writer thread and close the archive."""
+        self.queue.put(None)
+        self._thread.join()
+        self.writer.close()
+
+    def print_stats(self):
+        mean_ms = (
+            self.enqueue_seconds_total / self.enqueued * 1000 if self.enqueued else 0
+        )
+        print(f"Writer queue: max depth {self.max_depth}/{self.max_queue}")
+        print(
+            f"Enqueue latency: mean {mean_ms:.3f} ms, "
+            f"max {self.enqueue_seconds_max * 1000:.3f} ms"
+        )
+        print(f"Dropped (queue full): {self.dropped}")
+        if self.write_errors:
+            print(f"Write errors: {self.write_errors}")
+
+
+class PooledArchiveWriter(BackgroundArchiveWriter):
+    """A ``BackgroundArchiveWriter`` drained by tasks on a shared ``executor``.
+
+    Used when several sources are captured at once: rather than a writer
+    thread per source, each writer has at most one drain task on the pool at
+    a time, so its frames are still written one by one and in order while
+    the threads are shared between all sources.
+    """
+
+    def __init__(self, writer, executor, max_queue=256, release=None):
+        self.executor = executor
+        super().__init__(writer, max_queue, release)
+
+    def _start(self):
+        self._lock = threading.Lock()
+        self._scheduled = False
+        self._idle = threading.Event()
+        self._idle.set()
+
+    def add_frame(self, name, data, mtime, counter=None):
+        if not super().add_frame(name, data, mtime, counter):
+            return False
+        with self._lock:
+            if not self._scheduled:
+                self._scheduled = True
+                self._idle.clear()
+                self.executor.submit(self._drain)
+        return True
+
+    def _drain(self):
+        while True:
+            try:
+                item = self.queue.get_nowait()
+            except queue.Empty:
+                with self._lock:
+                    # A frame queued since get_nowait() would find us scheduled
+                    if self.queue.empty():
+                        self._scheduled = False
+                        self._idle.set()
+                        return
+                continue
+            self._write(item)
+
+    def close(self):
+        """Wait for the queued frames to be written and close the archive."""
+        self._idle.wait()
+        self.writer.close()
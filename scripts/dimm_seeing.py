@@ -0,0 +1,415 @@
+"""Live seeing estimates from DIMM differential spot motion.
+
+A DIMM images one star through two sub-apertures of diameter ``aperture``
+separated by ``baseline`` (both in metres), giving two spots. Atmospheric
+tilt moves the spots differently; the variance of their separation along
+(longitudinal) and across (transverse) the baseline gives the Fried
+parameter r0 (Tokovinin 2002, PASP 114, 1156):
+
+    sigma_l^2 = K_l lambda^2 r0^(-5/3) D^(-1/3)
+    sigma_t^2 = K_t lambda^2 r0^(-5/3) D^(-1/3)
+
+with K_l, K_t functions of baseline/aperture, and the seeing (FWHM) is
+0.98 lambda / r0. No correction is made for centroid noise or finite
+exposure time, so values are slightly pessimistic on faint stars and
+optimistic with long exposures.
+"""
+import collections
+import csv
+import math
+import queue
+import threading
+from datetime import datetime, timezone
+
+from dimm_fits import read_pixels
+from dimm_stats import RunningCovariance
+
+ARCSEC_PER_RAD = 180 / math.pi * 3600
+DEFAULT_WAVELENGTH = 500e-9
+
+# Background and noise come from every Nth pixel; a prime stride avoids
+# sampling the same columns on every row
+BACKGROUND_STRIDE = 7
+
+SEEING_LOG_SUFFIX = ".seeing.csv"
+SEEING_LOG_FIELDS = (
+    "time_utc",
+    "frames",
+    "seeing_arcsec",
+    "seeing_l_arcsec",
+    "seeing_t_arcsec",
+    "r0_cm",
+)
+
+SeeingEstimate = collections.namedtuple(
+    "SeeingEstimate", "time frames seeing seeing_l seeing_t r0"
+)
+
+
+def response_coefficients(aperture, baseline):
+    """Longitudinal and transverse coefficients ``(K_l, K_t)``."""
+    b = baseline / aperture
+    k_l = 0.364 * (1 - 0.532 * b ** (-1 / 3) - 0.024 * b ** (-7 / 3))
+    k_t = 0.364 * (1 - 0.798 * b ** (-1 / 3) + 0.018 * b ** (-7 / 3))
+    return k_l, k_t
+
+
+def fried_parameter(variance, k, aperture, wavelength=DEFAULT_WAVELENGTH):
+    """r0 in metres from a differential motion variance in rad^2."""
+    return (k * wavelength**2 * aperture ** (-1 / 3) / variance) ** 0.6
+
+
+def seeing_arcsec(r0, wavelength=DEFAULT_WAVELENGTH):
+    """Seeing FWHM in arcsec for a Fried parameter in metres."""
+    return 0.98 * wavelength / r0 * ARCSEC_PER_RAD
+
+
+def measure_spots_batch(stack, window=6, threshold=5.0, chunk_frames=256):
+    """Measure the two brightest spots in every frame of a stack.
+
+    ``stack`` is an N x H x W array (e.g. a cube from ``load_frame_cube``).
+    Returns a dict of arrays: ``x``, ``y`` (centroid), ``flux`` (summed
+    background-subtracted counts) and ``width`` (RMS radius per axis, i.e.
+    the Gaussian sigma), each N x 2 with the spots ordered by x then y and
+    NaN where a frame has no two spots, plus the per-frame ``background``
+    and ``noise`` (length N).
+
+    The background is each frame's median and the noise its median absolute
+    deviation, both taken over every ``BACKGROUND_STRIDE``-th pixel. Each
+    spot is found at the brightest remaining pixel and measured from the
+    background-subtracted pixels above ``threshold`` times the noise in a
+    box of ``window`` pixels around it; pixels within ``2 * window`` of the
+    first spot are excluded when looking for the second. All of this is done
+    with array reductions over ``chunk_frames`` frames at a time, bounding
+    the temporary memory.
+    """
+    import numpy as np
+
+    stack = np.asarray(stack)
+    if stack.ndim == 2:
+        stack = stack[np.newaxis]
+    count, height, width = stack.shape
+    result = {
+        name: np.full((count, 2), np.nan) for name in ("x", "y", "flux", "width")
+    }
+    result["background"] = np.empty(count)
+    result["noise"] = np.empty(count)
+    offsets = np.arange(-window, window + 1)
+    wide = np.arange(-2 * window, 2 * window + 1)
+
+    for start in range(0, count, chunk_frames):
+        img = stack[start : start + chunk_frames].astype(np.float32)
+        n = len(img)
+        rows = slice(start, start + n)
+        flat = img.reshape(n, -1)
+        sample = flat[:, ::BACKGROUND_STRIDE]
+        background = np.median(sample, axis=1, keepdims=True)
+        noise = 1.4826 * np.median(np.abs(sample - background), axis=1)
+        flat -= background
+        noise[noise == 0] = 1.0
+        cut = threshold * noise
+        result["background"][rows] = background[:, 0]
+        result["noise"][rows] = noise
+        frame = np.arange(n)[:, None, None]
+
+        search = img
+        found = np.ones(n, dtype=bool)
+        for spot in range(2):
+            peak = search.reshape(n, -1).argmax(axis=1)
+            y, x = np.divmod(peak, width)
+            found &= search.reshape(n, -1)[np.arange(n), peak] > cut
+
+            # Gather each frame's box around its peak; off-edge pixels get no weight
+            box_y = y[:, None] + offsets
+            box_x = x[:, None] + offsets
+            inside = ((box_y >= 0) & (box_y < height))[:, :, None] & (
+                (box_x >= 0) & (box_x < width)
+            )[:, None, :]
+            box = img[
+                frame,
+                box_y.clip(0, height - 1)[:, :, None],
+                box_x.clip(0, width - 1)[:, None, :],
+            ]
+            weights = np.where(inside & (box > cut[:, None, None]), box, 0.0)
+            # Marginal profiles give both moments without N x box x box products
+            profile_x = weights.sum(axis=1)
+            profile_y = weights.sum(axis=2)
+            total = profile_x.sum(axis=1)
+            total[total == 0] = np.nan
+            cx = (profile_x * box_x).sum(axis=1) / total
+            cy = (profile_y * box_y).sum(axis=1) / total
+            var_x = (profile_x * (box_x - cx[:, None]) ** 2).sum(axis=1) / total
+            var_y = (profile_y * (box_y - cy[:, None]) ** 2).sum(axis=1) / total
+            result["x"][rows, spot] = cx
+            result["y"][rows, spot] = cy
+            result["flux"][rows, spot] = total
+            result["width"][rows, spot] = np.sqrt((var_x + var_y) / 2)
+
+            if spot == 0:
+                # Blank out the first spot and its wings
+                search = img.copy()
+                search[
+                    frame,
+                    (y[:, None] + wide).clip(0, height - 1)[:, :, None],
+                    (x[:, None] + wide).clip(0, width - 1)[:, None, :],
+                ] = -np.inf
+
+        for name in ("x", "y", "flux", "width"):
+            result[name][rows][~found] = np.nan
+
+    # Order the two spots by x, then y
+    x, y = result["x"], result["y"]
+    swap = (x[:, 0] > x[:, 1]) | ((x[:, 0] == x[:, 1]) & (y[:, 0] > y[:, 1]))
+    for name in ("x", "y", "flux", "width"):
+        result[name][swap] = result[name][swap][:, ::-1]
+    return result
+
+
+def locate_spots_batch(stack, window=6, threshold=5.0, chunk_frames=256):
+    """Centroids of the two brightest spots in every frame of a stack.
+
+    Returns an N x 2 x 2 array of ``[[x1, y1], [x2, y2]]`` per frame, NaN
+    where a frame has no two spots; see ``measure_spots_batch``.
+    """
+    import numpy as np
+
+    spots = measure_spots_batch(stack, window, threshold, chunk_frames)
+    return np.stack((spots["x"], spots["y"]), axis=-1)
+
+
+def locate_spots(frame, window=6, threshold=5.0):
+    """Centroids ``((x1, y1), (x2, y2))`` of the two spots in one frame, or None.
+
+    Same measurement as ``locate_spots_batch``, for a single H x W frame.
+    """
+    (x1, y1), (x2, y2) = locate_spots_batch(frame, window, threshold)[0].tolist()
+    if math.isnan(x1) or math.isnan(x2):
+        return None
+    return (x1, y1), (x2, y2)
+
+
+class SeeingEstimator:
+    """Accumulate spot separations and produce a seeing estimate per interval.
+
+    ``pixel_scale`` is in arcsec per pixel, ``aperture`` and ``baseline`` in
+    metres, ``wavelength`` in metres. The baseline direction is taken from
+    the mean separation, so the camera need not be aligned with it. An
+    estimate is returned by ``add_frame`` once ``interval`` seconds of frame
+    time have accumulated with at least ``min_frames`` usable frames.
+    """
+
+    def __init__(
+        self,
+        pixel_scale,
+        aperture,
+        baseline,
+        wavelength=DEFAULT_WAVELENGTH,
+        interval=10.0,
+        min_frames=20,
+        window=6,
+        threshold=5.0,
+    ):
+        self.pixel_scale = pixel_scale
+        self.aperture = aperture
+        self.wavelength = wavelength
+        self.interval = interval
+        self.min_frames = min_frames
+        self.window = window
+        self.threshold = threshold
+        self.k_l, self.k_t = response_coefficients(aperture, baseline)
+        self.separation = RunningCovariance()
+        self.frames = 0
+        self.no_spots = 0
+        self.estimates = []
+        self._reference = None
+        self._start = None
+        self._last_time = None
+
+    def add_frame(self, pixels, frame_time):
+        """Add one frame's pixels; returns a ``SeeingEstimate`` or None."""
+        spots = locate_spots(pixels, self.window, self.threshold)
+        if spots is None:
+            self.no_spots += 1
+        return self.add_spots(spots, frame_time)
+
+    def add_stack(self, stack, frame_times):
+        """Add an N x H x W stack of frames; returns the estimates it completed."""
+        estimates = []
+        spots = locate_spots_batch(stack, self.window, self.threshold)
+        for frame_spots, frame_time in zip(spots.tolist(), frame_times):
+            if math.isnan(frame_spots[0][0]) or math.isnan(frame_spots[1][0]):
+                self.no_spots += 1
+                frame_spots = None
+            estimate = self.add_spots(frame_spots, frame_time)
+            if estimate is not None:
+                estimates.append(estimate)
+        return estimates
+
+    def add_spots(self, spots, frame_time):
+        """Add one frame's spot centroids (None if not found)."""
+        if self._start is None:
+            self._start = frame_time
+        self._last_time = frame_time
+        if spots is not None:
+            (x1, y1), (x2, y2) = spots
+            dx, dy = x2 - x1, y2 - y1
+            if self._reference is None:
+                self._reference = (dx, dy)
+            elif dx * self._reference[0] + dy * self._reference[1] < 0:
+                # Spots came out in the other order; keep the sign consistent
+                dx, dy = -dx, -dy
+            self.separation.add(dx, dy)
+            self.frames += 1
+        if frame_time - self._start >= self.interval:
+            return self.finish(frame_time)
+        return None
+
+    def finish(self, end_time=None):
+        """Close the current interval; returns its estimate, or None if too few."""
+        stats = self.separation
+        estimate = None
+        if stats.n >= self.min_frames:
+            estimate = self._estimate(end_time or self._last_time)
+        stats.reset()
+        self._start = None
+        if estimate is not None:
+            self.estimates.append(estimate)
+        return estimate
+
+    def _estimate(self, end_time):
+        stats = self.separation
+        var_x, var_y, cov_xy = stats.covariance()
+        length = math.hypot(stats.mean_x, stats.mean_y)
+        if length == 0:
+            return None
+        ux, uy = stats.mean_x / length, stats.mean_y / length
+        var_l = ux * ux * var_x + uy * uy * var_y + 2 * ux * uy * cov_xy
+        var_t = uy * uy * var_x + ux * ux * var_y - 2 * ux * uy * cov_xy
+        if var_l <= 0 or var_t <= 0:
+            return None
+
+        rad_per_pixel = self.pixel_scale / ARCSEC_PER_RAD
+        r0_l = fried_parameter(
+            var_l * rad_per_pixel**2, self.k_l, self.aperture, self.wavelength
+        )
+        r0_t = fried_parameter(
+            var_t * rad_per_pixel**2, self.k_t, self.aperture, self.wavelength
+        )
+        seeing_l = seeing_arcsec(r0_l, self.wavelength)
+        seeing_t = seeing_arcsec(r0_t, self.wavelength)
+        seeing = (seeing_l + seeing_t) / 2
+        r0 = 0.98 * self.wavelength / (seeing / ARCSEC_PER_RAD)
+        return SeeingEstimate(end_time, stats.n, seeing, seeing_l, seeing_t, r0)
+
+
+class SeeingMonitor:
+    """Run a ``SeeingEstimator`` on its own thread, fed raw FITS frames.
+
+    ``add_frame`` decodes the pixels (a copy, so pooled read buffers can be
+    reused at once) and queues them; the monitor thread centroids whatever
+    has queued up, up to ``batch_frames`` at a time, in one batch. Frames
+    are dropped rather than blocking capture if the queue is full. Each
+    estimate is printed and, with ``log_path``, appended to a CSV.
+    """
+
+    def __init__(self, estimator, max_queue=64, log_path=None, batch_frames=32):
+        self.estimator = estimator
+        self.batch_frames = batch_frames
+        self.queue = queue.Queue(maxsize=max_queue)
+        self.dropped = 0
+        self.errors = 0
+        self.latest = None
+        self._log_file = None
+        self.log = None
+        if log_path:
+            self._log_file = open(log_path, "w", newline="")
+            self.log = csv.writer(self._log_file)
+            self.log.writerow(SEEING_LOG_FIELDS)
+        self._thread = threading.Thread(
+            target=self._run, name="dimm-seeing", daemon=True
+        )
+        self._thread.start()
+
+    def add_frame(self, data, frame_time):
+        try:
+            self.queue.put_nowait((read_pixels(data), frame_time))
+        except queue.Full:
+            self.dropped += 1
+
+    def _run(self):
+        import numpy as np
+
+        while True:
+            batch = [self.queue.get()]
+            while batch[-1] is not None and len(batch) < self.batch_frames:
+                try:
+                    batch.append(self.queue.get_nowait())
+                except queue.Empty:
+                    break
+            stop = batch[-1] is None
+            if stop:
+                batch.pop()
+            # Frames of one shape at a time (the camera ROI may change)
+            while batch:
+                shape = batch[0][0].shape
+                run = 1
+                while run < len(batch) and batch[run][0].shape == shape:
+                    run += 1
+                pixels, times = zip(*batch[:run])
+                del batch[:run]
+                try:
+                    for estimate in self.estimator.add_stack(np.stack(pixels), times):
+                        self.report(estimate)
+                except Exception as e:
+                    self.errors += 1
+                    print(f"Seeing error: {e}")
+            if stop:
+                break
+
+    def report(self, estimate):
+        if estimate is None:
+            return
+        self.latest = estimate
+        when = datetime.fromtimestamp(estimate.time, timezone.utc)
+        print(
+            f"Seeing: {estimate.seeing:.2f}\" (long. {estimate.seeing_l:.2f}\", "
+            f"trans. {estimate.seeing_t:.2f}\", r0 {estimate.r0 * 100:.1f} cm) "
+            f"from {estimate.frames} frames at {when:%H:%M:%S}"
+        )
+        if self.log is not None:
+            self.log.writerow(
+                (
+                    when.strftime("%Y-%m-%dT%H:%M:%S.%f")[:-3],
+                    estimate.frames,
+                    f"{estimate.seeing:.3f}",
+                    f"{estimate.seeing_l:.3f}",
+                    f"{estimate.seeing_t:.3f}",
+                    f"{estimate.r0 * 100:.2f}",
+                )
+            )
+            self._log_file.flush()
+
+    def close(self):
+        """Process queued frames, report the last partial interval and stop."""
+        self.queue.put(None)
+        self._thread.join()
+        self.report(self.estimator.finish())
+        if self._log_file is not None:
+            self._log_file.close()
+            self.log = None
+
+    def print_stats(self):
+        estimator = self.estimator
+        estimates = estimator.estimates
+        print(
+            f"Seeing: {len(estimates)} estimates from {estimator.frames} frames "
+            f"({estimator.no_spots} without two spots, {self.dropped} dropped)"
+        )
+        if estimates:
+            values = sorted(e.seeing for e in estimates)
+            print(
+                f"Seeing median {values[len(values) // 2]:.2f}\", "
+                f"range {values[0]:.2f}-{values[-1]:.2f}\""
+            )
+        if self.errors:
+            print(f"Seeing errors: {self.errors}")
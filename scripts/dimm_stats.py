@@ -0,0 +1,167 @@
+"""Constant-memory streaming statistics."""
+
+
+class RunningCovariance:
+    """Welford's online mean and covariance of 2D samples.
+
+    Numerically stable for long runs: no running sums of squares are kept,
+    only deviations from the running mean.
+    """
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self.n = 0
+        self.mean_x = 0.0
+        self.mean_y = 0.0
+        self._m2_xx = 0.0
+        self._m2_yy = 0.0
+        self._m2_xy = 0.0
+
+    def add(self, x, y):
+        self.n += 1
+        dx = x - self.mean_x
+        dy = y - self.mean_y
+        self.mean_x += dx / self.n
+        self.mean_y += dy / self.n
+        self._m2_xx += dx * (x - self.mean_x)
+        self._m2_yy += dy * (y - self.mean_y)
+        self._m2_xy += dx * (y - self.mean_y)
+
+    def covariance(self):
+        """Sample covariance ``(var_x, var_y, cov_xy)``; zeros below two samples."""
+        if self.n < 2:
+            return 0.0, 0.0, 0.0
+        d = self.n - 1
+        return self._m2_xx / d, self._m2_yy / d, self._m2_xy / d
+
+
+class RunningStats:
+    """Welford's online count, mean, variance, minimum and maximum."""
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self.n = 0
+        self.mean = 0.0
+        self._m2 = 0.0
+        self.min = None
+        self.max = None
+
+    def add(self, x):
+        self.n += 1
+        delta = x - self.mean
+        self.mean += delta / self.n
+        self._m2 += delta * (x - self.mean)
+        if self.min is None or x < self.min:
+            self.min = x
+        if self.max is None or x > self.max:
+            self.max = x
+
+    @property
+    def variance(self):
+        """Sample variance; zero below two samples."""
+        return self._m2 / (self.n - 1) if self.n > 1 else 0.0
+
+    @property
+    def std(self):
+        return self.variance**0.5
+
+
+class P2Quantile:
+    """Streaming estimate of one quantile with the P-squared algorithm.
+
+    Jain & Chlamtac (1985): five markers track the minimum, the quantile
+    ``p``, halfway points either side of it and the maximum, and their
+    heights are adjusted with a piecewise-parabolic fit as samples arrive.
+    Constant memory and time per sample; exact for the first five samples.
+    """
+
+    def __init__(self, p):
+        self.p = p
+        self.reset()
+
+    def reset(self):
+        p = self.p
+        self.n = 0
+        self._heights = []
+        self._positions = [1, 2, 3, 4, 5]
+        self._desired = [1, 1 + 2 * p, 1 + 4 * p, 3 + 2 * p, 5]
+        self._increments = [0, p / 2, p, (1 + p) / 2, 1]
+
+    def add(self, x):
+        self.n += 1
+        q = self._heights
+        if self.n <= 5:
+            q.append(x)
+            q.sort()
+            return
+
+        pos = self._positions
+        if x < q[0]:
+            q[0] = x
+            k = 0
+        elif x >= q[4]:
+            q[4] = x
+            k = 3
+        else:
+            k = 0
+            while x >= q[k + 1]:
+                k += 1
+        for i in range(k + 1, 5):
+            pos[i] += 1
+        for i in range(5):
+            self._desired[i] += self._increments[i]
+
+        for i in range(1, 4):
+            d = self._desired[i] - pos[i]
+            if (d >= 1 and pos[i + 1] - pos[i] > 1) or (
+                d <= -1 and pos[i - 1] - pos[i] < -1
+            ):
+                d = 1 if d > 0 else -1
+                height = q[i] + d / (pos[i + 1] - pos[i - 1]) * (
+                    (pos[i] - pos[i - 1] + d) * (q[i + 1] - q[i]) / (pos[i + 1] - pos[i])
+                    + (pos[i + 1] - pos[i] - d) * (q[i] - q[i - 1]) / (pos[i] - pos[i - 1])
+                )
+                if not q[i - 1] < height < q[i + 1]:
+                    # Parabola overshoots a neighbour; fall back to linear
+                    height = q[i] + d * (q[i + d] - q[i]) / (pos[i + d] - pos[i])
+                q[i] = height
+                pos[i] += d
+
+    @property
+    def value(self):
+        """Current estimate, or None before any samples."""
+        if not self._heights:
+            return None
+        if self.n > 5:
+            return self._heights[2]
+        rank = min(self.n - 1, max(0, round(self.p * self.n) - 1))
+        return self._heights[rank]
+
+
+class StreamingSummary:
+    """Running moments plus P-squared ``quantiles`` of one stream of values."""
+
+    def __init__(self, quantiles=(0.5, 0.9, 0.99)):
+        self.stats = RunningStats()
+        self.quantiles = {p: P2Quantile(p) for p in quantiles}
+
+    def reset(self):
+        self.stats.reset()
+        for estimator in self.quantiles.values():
+            estimator.reset()
+
+    def add(self, x):
+        self.stats.add(x)
+        for estimator in self.quantiles.values():
+            estimator.add(x)
+
+    @property
+    def n(self):
+        return self.stats.n
+
+    def quantile(self, p):
+        return self.quantiles[p].value
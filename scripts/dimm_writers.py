@@ -0,0 +1,556 @@
+"""Writers for DIMM capture outputs, the counterparts of ``dimm_archive``.
+
+Tar archives with any of the ``CODECS`` (pgzip with an optional frame
+index), memory-mapped frame cubes and centroid tables. Every writer has
+``add_frame(name, data, mtime, counter=None)``, ``bytes_written()`` and
+``close()``, and counts its input bytes and time for ``throughput_mb_s``.
+"""
+import collections
+import concurrent.futures
+import functools
+import gzip
+import os
+import struct
+import tarfile
+import time
+from pathlib import Path
+
+from dimm_archive import (
+    CENTROID_COLUMNS,
+    centroid_column_path,
+    cube_paths,
+    index_path_for,
+    write_centroid_schema,
+    write_cube_metadata,
+    write_index_header,
+)
+from dimm_fits import read_pixels
+from dimm_seeing import measure_spots_batch
+
+
+CODECS = ("none", "gzip", "zstd", "lz4", "pgzip")
+
+# Level used when --level is not given. gzip keeps tarfile's historical default.
+DEFAULT_LEVELS = {"none": None, "gzip": 9, "zstd": 3, "lz4": 0, "pgzip": 6}
+
+CODEC_SUFFIXES = {
+    "none": ".tar",
+    "gzip": ".tar.gz",
+    "zstd": ".tar.zst",
+    "lz4": ".tar.lz4",
+    "pgzip": ".tar.gz",
+}
+
+# Optional packages the codecs need
+CODEC_PACKAGES = {"zstd": "zstandard", "lz4": "lz4"}
+
+
+def open_tar_for_codec(tar_path, codec="gzip", level=None):
+    """Open a tar archive for writing with the requested compression codec.
+
+    Returns ``(tar_file, stream)`` where ``stream`` is an extra file object
+    that must be closed after the tar file (zstd/lz4 framing), or None.
+    """
+    if codec not in CODECS or codec == "pgzip":
+        raise ValueError(f"Unknown tarfile codec {codec!r}")
+    if level is None:
+        level = DEFAULT_LEVELS[codec]
+
+    if codec == "none":
+        return tarfile.open(tar_path, "w"), None
+    if codec == "gzip":
+        return tarfile.open(tar_path, "w:gz", compresslevel=level), None
+
+    if codec == "zstd":
+        try:
+            import zstandard
+        except ImportError:
+            raise RuntimeError("zstd codec requires the 'zstandard' package")
+        stream = zstandard.ZstdCompressor(level=level).stream_writer(
+            open(tar_path, "wb")
+        )
+    else:
+        try:
+            import lz4.frame
+        except ImportError:
+            raise RuntimeError("lz4 codec requires the 'lz4' package")
+        stream = lz4.frame.open(tar_path, "wb", compression_level=level)
+
+    # Streaming tar mode: no seeking/tell needed on the compressed stream
+    return tarfile.open(fileobj=stream, mode="w|"), stream
+
+
+def tar_info(name, size, mtime):
+    """The ``TarInfo`` of a frame member of ``size`` bytes."""
+    tarinfo = tarfile.TarInfo(name=name)
+    tarinfo.size = size
+    tarinfo.mtime = int(mtime)  # a float mtime costs an extra PAX header
+    return tarinfo
+
+
+def tar_header(name, size, mtime):
+    """Serialize the tar header block(s) for a member of ``size`` bytes."""
+    return tar_info(name, size, mtime).tobuf(
+        tarfile.DEFAULT_FORMAT, tarfile.ENCODING, "surrogateescape"
+    )
+
+
+class ArchiveWriter:
+    """Base of the writers, which count ``bytes_in`` and ``write_seconds``."""
+
+    def throughput_mb_s(self):
+        """Input MB/s spent inside the writer."""
+        if self.write_seconds <= 0:
+            return 0.0
+        return self.bytes_in / (1024 * 1024) / self.write_seconds
+
+
+class _BufferReader:
+    """File-like view over a buffer whose reads return memoryview slices.
+
+    Lets ``tarfile.addfile`` copy a frame into the archive without the
+    intermediate ``bytes`` copy that ``io.BytesIO`` would make.
+    """
+
+    def __init__(self, data):
+        self._view = memoryview(data)
+        self._pos = 0
+
+    def read(self, size=-1):
+        end = len(self._view) if size < 0 else self._pos + size
+        chunk = self._view[self._pos : end]
+        self._pos += len(chunk)
+        return chunk
+
+
+class TarArchiveWriter(ArchiveWriter):
+    """Append frames to a tar archive in the calling thread.
+
+    Like every archive writer, ``add_frame`` also takes the frame counter
+    the capture handler read from the header; writers that do not store it
+    ignore it.
+    """
+
+    def __init__(self, tar_path, codec="gzip", level=None):
+        self.tar_path = tar_path
+        self.codec = codec
+        self.level = DEFAULT_LEVELS[codec] if level is None else level
+        self.tar_file, self._stream = open_tar_for_codec(tar_path, codec, level)
+        self.bytes_in = 0
+        self.write_seconds = 0.0
+
+    @property
+    def codec_label(self):
+        return self.codec if self.level is None else f"{self.codec}-{self.level}"
+
+    def add_frame(self, name, data, mtime, counter=None):
+        """Add one frame to the archive. Returns True once it is written."""
+        t0 = time.perf_counter()
+        self.tar_file.addfile(tar_info(name, len(data), mtime), _BufferReader(data))
+        self.write_seconds += time.perf_counter() - t0
+        self.bytes_in += len(data)
+        return True
+
+    def bytes_written(self):
+        """Compressed bytes in the archive file so far."""
+        return os.stat(self.tar_path).st_size
+
+    def close(self):
+        """Close the tar file"""
+        if self.tar_file:
+            t0 = time.perf_counter()
+            self.tar_file.close()
+            if self._stream is not None:
+                self._stream.close()
+            self.write_seconds += time.perf_counter() - t0
+            self.tar_file = None
+
+
+
+
+def _compress_block(data, level):
+    t0 = time.perf_counter()
+    member = gzip.compress(data, compresslevel=level, mtime=0)
+    return member, time.perf_counter() - t0
+
+
+class ParallelGzipTarWriter(ArchiveWriter):
+    """Write a tar.gz whose blocks of frames are compressed on a worker pool.
+
+    Frames are serialized into tar records and grouped into blocks of
+    ``block_frames``. Each block becomes an independent gzip member (as pigz
+    or BGZF do); members are written in submission order, so the output is a
+    regular tar.gz that any gzip reader can decompress as one stream.
+
+    With ``index`` a sidecar index records the compressed offset and length
+    of the member holding each frame, which ``dimm_archive.SeekableFrameArchive``
+    uses to fetch any frame without decompressing from the start.
+
+    Several writers can share one ``executor`` of ``workers`` threads (one
+    per camera in a multi-source capture); it is then left running on close.
+    """
+
+    def __init__(
+        self,
+        tar_path,
+        level=6,
+        workers=None,
+        block_frames=16,
+        pool="thread",
+        index=False,
+        executor=None,
+    ):
+        self.tar_path = tar_path
+        self.codec = "pgzip"
+        self.level = level
+        self.workers = workers or os.cpu_count() or 1
+        self.block_frames = block_frames
+        self.bytes_in = 0
+        self.write_seconds = 0.0
+        self.compress_seconds = 0.0
+        self.blocks_written = 0
+
+        self._own_executor = executor is None
+        if executor is None:
+            executor_class = (
+                concurrent.futures.ProcessPoolExecutor
+                if pool == "process"
+                else concurrent.futures.ThreadPoolExecutor
+            )
+            executor = executor_class(max_workers=self.workers)
+        self._executor = executor
+        self._file = open(tar_path, "wb")
+        self._block = bytearray()
+        self._block_entries = []
+        self._pending = collections.deque()
+        self._offset = 0
+
+        self._index_file = None
+        if index:
+            self._index_file = open(index_path_for(tar_path), "w", newline="")
+            self._index = write_index_header(self._index_file)
+
+    @property
+    def codec_label(self):
+        return f"pgzip-{self.level}x{self.workers}"
+
+    def add_frame(self, name, data, mtime, counter=None):
+        """Add one frame to the current block. Returns True once it is queued."""
+        t0 = time.perf_counter()
+        header = tar_header(name, len(data), mtime)
+        self._block += header
+        data_offset = len(self._block)
+        self._block += data
+        self._block += tarfile.NUL * (-len(data) % tarfile.BLOCKSIZE)
+        self._block_entries.append((name, mtime, data_offset, len(data)))
+        self.bytes_in += len(data)
+        if len(self._block_entries) >= self.block_frames:
+            self._submit_block()
+        self.write_seconds += time.perf_counter() - t0
+        return True
+
+    def _submit_block(self):
+        future = self._executor.submit(_compress_block, self._block, self.level)
+        self._pending.append((future, self._block_entries))
+        self._block = bytearray()
+        self._block_entries = []
+
+        # Write finished blocks in order; block only when too far ahead
+        while self._pending and (
+            self._pending[0][0].done() or len(self._pending) > 2 * self.workers
+        ):
+            self._write_block(*self._pending.popleft())
+
+    def _write_block(self, future, entries):
+        member, seconds = future.result()
+        self._file.write(member)
+        if self._index_file is not None:
+            for name, mtime, data_offset, size in entries:
+                self._index.writerow(
+                    (name, f"{mtime:.6f}", self._offset, len(member), data_offset, size)
+                )
+        self._offset += len(member)
+        self.compress_seconds += seconds
+        self.blocks_written += 1
+
+    def bytes_written(self):
+        """Compressed bytes of the blocks written so far."""
+        return self._offset
+
+    def close(self):
+        """Flush remaining blocks, write the end-of-archive marker and close."""
+        if self._file is None:
+            return
+        t0 = time.perf_counter()
+        self._block += tarfile.NUL * (2 * tarfile.BLOCKSIZE)
+        self._submit_block()
+        while self._pending:
+            self._write_block(*self._pending.popleft())
+        if self._own_executor:
+            self._executor.shutdown()
+        self._file.close()
+        self._file = None
+        if self._index_file is not None:
+            self._index_file.close()
+        self.write_seconds += time.perf_counter() - t0
+
+    def throughput_mb_s(self):
+        """Uncompressed MB/s the worker pool sustains when all workers are busy."""
+        busy_seconds = self.compress_seconds / self.workers
+        if busy_seconds <= 0:
+            return 0.0
+        return self.bytes_in / (1024 * 1024) / busy_seconds
+
+
+class FrameCubeWriter(ArchiveWriter):
+    """Stack frame pixels into a growable memory-mapped N x H x W cube.
+
+    The first frame fixes the frame shape and dtype, which go straight into
+    the JSON sidecar. Pixel storage is preallocated for ``initial_frames``
+    and doubled whenever it fills up; each frame's timestamp is appended to
+    the times file once its pixels are in place, so the length of that file
+    is the frame count and ``dimm_archive.load_frame_cube`` can map a cube
+    whose capture was killed. On close the pixel file is trimmed to the
+    frames actually written.
+    """
+
+    def __init__(self, cube_path, initial_frames=1024):
+        self.tar_path = cube_path
+        self.codec_label = "cube"
+        self.capacity = initial_frames
+        self.count = 0
+        self.bytes_in = 0
+        self.write_seconds = 0.0
+        self.frame_shape = None
+        self.dtype = None
+        self._frames = None
+        self._times = None
+        _, self._times_path = cube_paths(cube_path)
+
+    def _map(self, mode):
+        import numpy as np
+
+        self._frames = np.memmap(
+            self.tar_path,
+            dtype=self.dtype,
+            mode=mode,
+            shape=(self.capacity, *self.frame_shape),
+        )
+
+    def _grow(self):
+        self._frames.flush()
+        self._frames = None
+        self.capacity *= 2
+        self._map("r+")
+
+    def add_frame(self, name, data, mtime, counter=None):
+        """Copy one frame's pixels into the cube. Returns True once stored."""
+        t0 = time.perf_counter()
+        pixels = read_pixels(data)
+        if self._frames is None:
+            self.frame_shape = pixels.shape
+            self.dtype = pixels.dtype.str
+            self._map("w+")
+            self._times = open(self._times_path, "wb")
+            write_cube_metadata(self.tar_path, self.dtype, self.frame_shape, 0)
+        elif pixels.shape != self.frame_shape:
+            raise ValueError(
+                f"Frame shape {pixels.shape} does not match cube {self.frame_shape}"
+            )
+        if self.count == self.capacity:
+            self._grow()
+
+        self._frames[self.count] = pixels
+        self._times.write(struct.pack("<d", mtime))
+        self.count += 1
+        self.bytes_in += len(data)
+        self.write_seconds += time.perf_counter() - t0
+        return True
+
+    def bytes_written(self):
+        """Bytes of the frames stored so far (not the preallocated capacity)."""
+        if self._frames is None:
+            return 0
+        return self.count * (self._frames.itemsize * self._frames[0].size + 8)
+
+    def close(self):
+        """Flush the cube, trim unused capacity and write its metadata."""
+        if self._frames is None:
+            return
+        self._frames.flush()
+        self._times.close()
+        frame_bytes = self._frames.itemsize * self._frames[0].size
+        self._frames = self._times = None
+        os.truncate(self.tar_path, self.count * frame_bytes)
+        write_cube_metadata(self.tar_path, self.dtype, self.frame_shape, self.count)
+
+
+class CentroidTableWriter(ArchiveWriter):
+    """Store per-frame spot measurements instead of the frames themselves.
+
+    Frames are measured ``batch_frames`` at a time with
+    ``measure_spots_batch`` and appended to one raw file per column (see
+    ``dimm_archive.CENTROID_COLUMNS``) in the ``table_path`` directory: 56
+    bytes per frame instead of the whole FITS file. The frame counter column
+    holds the ``counter`` passed to ``add_frame`` (the one the capture
+    handler read with its configured keywords), or -1. With ``open_frames``
+    every ``keep_every``-th full frame is also archived, in the writer that
+    ``open_frames(path)`` returns, for QA.
+    """
+
+    def __init__(
+        self,
+        table_path,
+        batch_frames=64,
+        open_frames=None,
+        keep_every=None,
+        frames_name="frames.tar",
+        window=6,
+        threshold=5.0,
+    ):
+        self.tar_path = table_path
+        self.codec_label = "centroids"
+        self.batch_frames = batch_frames
+        self.keep_every = keep_every
+        self.window = window
+        self.threshold = threshold
+        self.count = 0
+        self.received = 0
+        self.kept = 0
+        self.no_spots = 0
+        self.bytes_in = 0
+        self.write_seconds = 0.0
+        self._pending = []
+        Path(table_path).mkdir(parents=True, exist_ok=True)
+        self._files = {
+            name: open(centroid_column_path(table_path, name), "wb")
+            for name, _ in CENTROID_COLUMNS
+        }
+        self.frame_writer = None
+        if open_frames is not None and keep_every:
+            self.frame_writer = open_frames(Path(table_path) / frames_name)
+        # Written up front too, so a killed capture still leaves a readable table
+        self._write_schema()
+
+    def add_frame(self, name, data, mtime, counter=None):
+        """Queue one frame for measurement. Returns True once accepted."""
+        t0 = time.perf_counter()
+        pixels = read_pixels(data)
+        if self._pending and pixels.shape != self._pending[0][0].shape:
+            self._flush()
+        counter = counter if isinstance(counter, int) else -1
+        self._pending.append((pixels, mtime, counter))
+        if self.frame_writer is not None and self.received % self.keep_every == 0:
+            self.frame_writer.add_frame(name, data, mtime, counter)
+            self.kept += 1
+        self.received += 1
+        self.bytes_in += len(data)
+        if len(self._pending) >= self.batch_frames:
+            self._flush()
+        self.write_seconds += time.perf_counter() - t0
+        return True
+
+    def _flush(self):
+        import numpy as np
+
+        if not self._pending:
+            return
+        pixels, times, counters = zip(*self._pending)
+        self._pending = []
+        spots = measure_spots_batch(np.stack(pixels), self.window, self.threshold)
+        columns = {
+            "time": times,
+            "counter": counters,
+            "background": spots["background"],
+            "noise": spots["noise"],
+        }
+        for name in ("x", "y", "flux", "width"):
+            columns[f"{name}1"] = spots[name][:, 0]
+            columns[f"{name}2"] = spots[name][:, 1]
+        for name, dtype in CENTROID_COLUMNS:
+            self._files[name].write(np.asarray(columns[name], dtype=dtype).tobytes())
+        self.count += len(times)
+        self.no_spots += int(np.isnan(spots["x"][:, 0]).sum())
+
+    def _write_schema(self):
+        write_centroid_schema(
+            self.tar_path,
+            self.count,
+            window=self.window,
+            threshold=self.threshold,
+            keep_every=self.keep_every if self.frame_writer else None,
+            frames_kept=self.kept,
+            frame_archive=(
+                Path(self.frame_writer.tar_path).name if self.frame_writer else None
+            ),
+        )
+
+    def bytes_written(self):
+        """Bytes of the table rows so far (measured or queued), plus kept frames."""
+        import numpy as np
+
+        row_bytes = sum(np.dtype(dtype).itemsize for _, dtype in CENTROID_COLUMNS)
+        written = (self.count + len(self._pending)) * row_bytes
+        if self.frame_writer is not None:
+            written += self.frame_writer.bytes_written()
+        return written
+
+    def close(self):
+        """Measure any remaining frames and finish the column files and schema."""
+        t0 = time.perf_counter()
+        self._flush()
+        self.write_seconds += time.perf_counter() - t0
+        for f in self._files.values():
+            f.close()
+        if self.frame_writer is not None:
+            self.frame_writer.close()
+        self._write_schema()
+
+
+OUTPUT_FORMATS = ("tar", "cube", "centroids")
+
+
+def open_archive_writer(
+    tar_path,
+    codec="gzip",
+    level=None,
+    workers=None,
+    block_frames=16,
+    index=False,
+    output_format="tar",
+    keep_every=None,
+    executor=None,
+):
+    """Create the archive writer for ``output_format`` and ``codec``.
+
+    For the centroids format ``codec`` and the options after it apply to the
+    archive of every ``keep_every``-th full frame. ``executor`` is a shared
+    compression pool for the pgzip codec.
+    """
+    if output_format == "cube":
+        return FrameCubeWriter(tar_path)
+    if output_format == "centroids":
+        open_frames = functools.partial(
+            open_archive_writer,
+            codec=codec,
+            level=level,
+            workers=workers,
+            block_frames=block_frames,
+            index=index,
+            executor=executor,
+        )
+        return CentroidTableWriter(
+            tar_path,
+            open_frames=open_frames,
+            keep_every=keep_every,
+            frames_name=f"frames{CODEC_SUFFIXES[codec]}",
+        )
+    if codec == "pgzip":
+        if level is None:
+            level = DEFAULT_LEVELS["pgzip"]
+        return ParallelGzipTarWriter(
+            tar_path, level, workers, block_frames, index=index, executor=executor
+        )
+    if index:
+        raise ValueError("A frame index requires the pgzip codec")
+    return TarArchiveWriter(tar_path, codec, level)
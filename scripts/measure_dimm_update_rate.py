@@ -1,53 +1,283 @@
 #!/usr/bin/env python3
 import argparse
-import subprocess
+import contextlib
 import time
 from datetime import datetime
 
-def monitor_file_events(filepath: str):
-    """Monitor all inotify events on a file with timing information."""
-    
-    proc = subprocess.Popen(
-        ['inotifywait', '-m', 
-         '-e', 'modify',
-         '-e', 'close_write', 
-         '-e', 'move_self',
-         '-e', 'attrib',
-         filepath],
-        stdout=subprocess.PIPE,
-        stderr=subprocess.DEVNULL,
-        text=True
-    )
-
-    prev_time = None
+from dimm_inotify import (
+    IN_ATTRIB,
+    IN_CLOSE_WRITE,
+    IN_MODIFY,
+    IN_MOVE_SELF,
+    IN_Q_OVERFLOW,
+    Inotify,
+    event_names,
+)
+from dimm_dashboard import StatusDashboard
+from dimm_eventlog import EventLogWriter
+from dimm_stats import StreamingSummary
+
+WATCH_MASK = IN_MODIFY | IN_CLOSE_WRITE | IN_MOVE_SELF | IN_ATTRIB
+
+
+class IntervalTracker:
+    """Timing statistics of one event type, for the current window and overall.
+
+    ``kind`` is "interval" for the time between successive events, or
+    "duration" for phases timed by the caller (``add_duration``). Memory is
+    constant however long the monitor runs: running moments and P-squared
+    quantile markers only, no list of values.
+    """
+
+    def __init__(self, kind="interval"):
+        self.kind = kind
+        self.prev_ns = None
+        self.window = StreamingSummary()
+        self.total = StreamingSummary()
+        self.window_events = 0
+        self.total_events = 0
+
+    def add(self, now_ns):
+        """Count an event at ``now_ns``; returns the ms since the previous one, or None."""
+        interval_ms = None
+        if self.prev_ns is not None:
+            interval_ms = (now_ns - self.prev_ns) / 1e6
+            self._record(interval_ms)
+        self.prev_ns = now_ns
+        self._count()
+        return interval_ms
+
+    def add_duration(self, duration_ms):
+        """Count one phase that lasted ``duration_ms``."""
+        self._record(duration_ms)
+        self._count()
+
+    def _record(self, value_ms):
+        self.window.add(value_ms)
+        self.total.add(value_ms)
+
+    def _count(self):
+        self.window_events += 1
+        self.total_events += 1
+
+    def reset_window(self):
+        self.window.reset()
+        self.window_events = 0
+
+
+def format_interval_stats(event_type, summary, events, seconds, kind="interval"):
+    """One line of interval (or duration) statistics, all times in ms."""
+    stats = summary.stats
+    rate = events / seconds if seconds > 0 else 0.0
+    if stats.n == 0:
+        return f"{event_type:15s}  n={events:<6d} rate {rate:7.1f} Hz"
+    return (
+        f"{event_type:15s}  n={events:<6d} rate {rate:7.1f} Hz  "
+        f"{kind:8s} mean {stats.mean:7.2f}  p50 {summary.quantile(0.5):7.2f}  "
+        f"p90 {summary.quantile(0.9):7.2f}  p99 {summary.quantile(0.99):7.2f}  "
+        f"max {stats.max:7.2f} ms  jitter {stats.std:6.3f} ms"
+    )
+
+
+def print_interval_stats(title, trackers, seconds, total=False):
+    print(f"--- {title} ({seconds:.1f} s) ---")
+    for event_type, tracker in trackers.items():
+        if total:
+            summary, events = tracker.total, tracker.total_events
+        else:
+            summary, events = tracker.window, tracker.window_events
+        if events:
+            print(
+                format_interval_stats(
+                    event_type, summary, events, seconds, tracker.kind
+                )
+            )
+
+
+def status_lines(trackers, count, overflows, batch_max, seconds, window):
+    """Dashboard lines: event totals, then each tracker's window so far (ms)."""
+    lines = [
+        f"Events: {count}, queue overflows: {overflows}, "
+        f"max {batch_max} per read ({seconds:.1f} of {window:g} s window)"
+    ]
+    for event_type, tracker in trackers.items():
+        summary = tracker.window
+        if not summary.n:
+            continue
+        rate = tracker.window_events / seconds if seconds > 0 else 0.0
+        lines.append(
+            f"{event_type:12s} {rate:7.1f} Hz  p50 {summary.quantile(0.5):6.2f}  "
+            f"p99 {summary.quantile(0.99):6.2f}  max {summary.stats.max:6.2f}  "
+            f"jitter {summary.stats.std:6.3f} ms"
+        )
+    return lines
+
+
+def monitor_file_events(
+    filepath: str,
+    window: float = 10.0,
+    binary_log: str = None,
+    print_events: bool = False,
+    status_hz: float = 2.0,
+):
+    """Monitor all inotify events on a file with timing information.
+
+    Events are read in-process from an inotify descriptor and timestamped with
+    ``time.monotonic_ns()`` as soon as each batch is read, so intervals do not
+    include pipe buffering or text parsing delays.
+
+    Intervals are measured between events of the same type, so partial-write
+    MODIFY bursts do not distort the CLOSE_WRITE (frame) rate. Two phases of
+    each frame are timed as well: the write, from the first MODIFY (the
+    truncate) to CLOSE_WRITE, during which a reader sees a partial file; and
+    the read window, from CLOSE_WRITE to the next frame's first MODIFY,
+    during which the file can be read whole. Events read in one batch share
+    a timestamp, so a write that completes within one batch reads as 0 ms,
+    and the kernel merges repeated MODIFY events that were not yet read.
+
+    Every ``window`` seconds the distribution of each over that window is
+    printed (count, rate, mean, p50/p90/p99/max and the standard deviation
+    as jitter), and on exit the same over the whole run. In between, a
+    status block with the statistics of the window so far, the event count,
+    inotify queue overflows (events the kernel dropped) and the most events
+    read at once (the backlog) is redrawn ``status_hz`` times a second. With
+    ``print_events`` each event is printed as a line instead.
+
+    With ``binary_log`` each event is only appended to that file as a
+    16-byte record (see ``dimm_eventlog``), and overflows counted: no
+    printing, and no interval statistics either, so that the monitor does
+    as little as possible per event at high frame rates. The records are
+    buffered and written at most every few thousand events and at each
+    window summary; ``dimm_eventlog.py`` computes the intervals offline.
+    """
+
+    inotify = Inotify()
+    inotify.add_watch(filepath, WATCH_MASK)
+    log = EventLogWriter(binary_log) if binary_log else None
+    print_events = print_events and not log
+    dashboard = None
+    if status_hz and not print_events:
+        dashboard = StatusDashboard(status_hz)
+
     count = 0
+    overflows = 0
+    batch_max = 0
+    trackers = {}
+    phases = {
+        "write": IntervalTracker("duration"),
+        "read window": IntervalTracker("duration"),
+    }
+    write_start_ns = None
+    last_close_ns = None
 
     print(f"Monitoring all events on: {filepath}")
+    if log:
+        print(f"Logging events to: {binary_log}")
     print("Press Ctrl+C to stop\n")
 
+    append = log.append if log else None
+    window_count = 0
+    start_ns = window_start_ns = time.monotonic_ns()
+    window_ns = int(window * 1e9)
     try:
-        for line in proc.stdout:
-            current_time = time.time()
-            timestamp = datetime.now().strftime('%H:%M:%S.%f')[:-3]  # milliseconds
-            
-            # Parse event type from inotifywait output
-            parts = line.strip().split()
-            event_type = parts[1] if len(parts) > 1 else "UNKNOWN"
-            
-            if prev_time:
-                interval = (current_time - prev_time) * 1000  # ms
-                hz = 1000 / interval
-                print(f"{timestamp}  {event_type:15s}  Interval: {interval:6.2f} ms  Rate: {hz:6.1f} Hz")
-            else:
-                print(f"{timestamp}  {event_type:15s}  (first event)")
-            
-            prev_time = current_time
-            count += 1
-                
+        with dashboard or contextlib.nullcontext():
+            while True:
+                wake_ns = window_start_ns + window_ns
+                if dashboard is not None:
+                    wake_ns = min(wake_ns, dashboard.next_ns)
+                timeout = max(0, wake_ns - time.monotonic_ns()) / 1e9
+                events = inotify.read_events(timeout)
+                current_ns = time.monotonic_ns()
+                if current_ns - window_start_ns >= window_ns:
+                    seconds = (current_ns - window_start_ns) / 1e9
+                    if log:
+                        print(
+                            f"--- Window ({seconds:.1f} s) --- "
+                            f"{count - window_count} events logged"
+                        )
+                    else:
+                        print_interval_stats(
+                            "Window", {**trackers, **phases}, seconds
+                        )
+                    print()
+                    window_count = count
+                    for tracker in [*trackers.values(), *phases.values()]:
+                        tracker.reset_window()
+                    window_start_ns = current_ns
+                    batch_max = 0
+                    if log:
+                        log.flush()
+                if print_events:
+                    timestamp = datetime.now().strftime('%H:%M:%S.%f')[:-3]  # milliseconds
+                batch_max = max(batch_max, len(events))
+
+                count += len(events)
+                if log:
+                    # Only the record; intervals are computed offline
+                    for wd, mask, cookie, name in events:
+                        append(current_ns, mask, cookie)
+                        if mask & IN_Q_OVERFLOW:
+                            overflows += 1
+                else:
+                    for wd, mask, cookie, name in events:
+                        if mask & IN_Q_OVERFLOW:
+                            overflows += 1
+                        event_type = ",".join(event_names(mask)) or "UNKNOWN"
+
+                        phase = ""
+                        if mask & IN_MODIFY and write_start_ns is None:
+                            write_start_ns = current_ns
+                            if last_close_ns is not None:
+                                phases["read window"].add_duration(
+                                    (current_ns - last_close_ns) / 1e6
+                                )
+                        if mask & IN_CLOSE_WRITE:
+                            if write_start_ns is not None:
+                                write_ms = (current_ns - write_start_ns) / 1e6
+                                phases["write"].add_duration(write_ms)
+                                phase = f"  Write: {write_ms:6.2f} ms"
+                            write_start_ns = None
+                            last_close_ns = current_ns
+
+                        if event_type not in trackers:
+                            trackers[event_type] = IntervalTracker()
+                        interval = trackers[event_type].add(current_ns)  # ms
+                        if not print_events:
+                            continue
+                        if interval is not None:
+                            hz = 1000 / interval if interval > 0 else float("inf")
+                            print(f"{timestamp}  {event_type:15s}  Interval: {interval:6.2f} ms  Rate: {hz:6.1f} Hz{phase}")
+                        else:
+                            print(f"{timestamp}  {event_type:15s}  (first event){phase}")
+
+                if dashboard is not None and dashboard.due(current_ns):
+                    dashboard.draw(
+                        status_lines(
+                            {**trackers, **phases},
+                            count,
+                            overflows,
+                            batch_max,
+                            (current_ns - window_start_ns) / 1e9,
+                            window,
+                        )
+                    )
+
     except KeyboardInterrupt:
-        print(f"\n\nStopped. Total events: {count}")
+        print(f"\n\nStopped. Total events: {count}, queue overflows: {overflows}")
+        if log:
+            print(f"Interval statistics: python dimm_eventlog.py {binary_log}")
+            return
+        print_interval_stats(
+            "Total",
+            {**trackers, **phases},
+            (time.monotonic_ns() - start_ns) / 1e9,
+            total=True,
+        )
     finally:
-        proc.terminate()
+        inotify.close()
+        if log:
+            log.close()
+            print(f"Wrote {log.records} events to {binary_log}")
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(
@@ -57,7 +287,31 @@ if __name__ == "__main__":
         "file",
         help="Path to the file to monitor"
     )
-    
-    args = parser.parse_args()
-    monitor_file_events(args.file)
+    parser.add_argument(
+        "--window",
+        type=float,
+        default=10.0,
+        help="Seconds per interval statistics summary (default: 10)",
+    )
+    parser.add_argument(
+        "--events",
+        action="store_true",
+        help="Print every event as a line instead of the live status display",
+    )
+    parser.add_argument(
+        "--status-hz",
+        type=float,
+        default=2.0,
+        help="Refresh rate of the live status display, 0 to turn it off "
+        "(default: 2)",
+    )
+    parser.add_argument(
+        "--binary-log",
+        help="Append each event to this file as a binary record instead of "
+        "printing it (decode with dimm_eventlog.py)",
+    )
 
+    args = parser.parse_args()
+    monitor_file_events(
+        args.file, args.window, args.binary_log, args.events, args.status_hz
+    )
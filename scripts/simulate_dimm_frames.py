@@ -0,0 +1,389 @@
+#!/usr/bin/env python3
+"""Write synthetic DIMM frames to a file, like the camera does.
+
+Each frame is a 16-bit FITS image of two Gaussian spots on a noisy
+background, with DATE-OBS and FRAMENUM in the header, rewritten at a fixed
+rate either in place (truncate and write, as the DIMM camera software does)
+or to a temporary file renamed over the target. Point
+``copy_and_tar_dimm_data.py`` or ``measure_dimm_update_rate.py`` at the
+path to test them without the camera.
+"""
+import argparse
+import math
+import os
+import queue
+import threading
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+
+from dimm_fits import BLOCK_SIZE, CARD_SIZE
+from dimm_seeing import ARCSEC_PER_RAD, DEFAULT_WAVELENGTH, response_coefficients
+
+WRITE_PATTERNS = ("inplace", "rename")
+
+
+def differential_sigmas(
+    seeing, pixel_scale, aperture, baseline, wavelength=DEFAULT_WAVELENGTH
+):
+    """Longitudinal and transverse differential motion in pixels RMS.
+
+    The inverse of the ``dimm_seeing`` estimate: frames simulated with these
+    should measure as ``seeing`` arcsec.
+    """
+    r0 = 0.98 * wavelength / (seeing / ARCSEC_PER_RAD)
+    pixel = pixel_scale / ARCSEC_PER_RAD
+    return tuple(
+        math.sqrt(k * wavelength**2 * r0 ** (-5 / 3) * aperture ** (-1 / 3)) / pixel
+        for k in response_coefficients(aperture, baseline)
+    )
+
+
+def spot_positions(
+    rng, frames, width=128, height=100, separation=40.0, jitter=1.0, differential=0.5
+):
+    """True spot centroids, an N x 2 x 2 array of ``[[x1, y1], [x2, y2]]``.
+
+    The spots sit ``separation`` pixels apart along x around the frame
+    centre and move together by ``jitter`` pixels RMS per axis (telescope
+    shake, which a DIMM cancels out). Their separation varies by
+    ``differential`` pixels RMS, or by ``(sigma_l, sigma_t)`` along and
+    across the baseline.
+    """
+    import numpy as np
+
+    centre = np.array([width / 2, height / 2])
+    nominal = np.array([centre - (separation / 2, 0), centre + (separation / 2, 0)])
+    spots = nominal + rng.normal(0, jitter, (frames, 1, 2))
+    motion = rng.normal(0, 1, (frames, 2)) * differential
+    spots[:, 0] -= motion / 2
+    spots[:, 1] += motion / 2
+    return spots
+
+
+def render_frames(
+    rng,
+    spots,
+    width=128,
+    height=100,
+    sigma=1.5,
+    peak=2000.0,
+    background=1000.0,
+    noise=3.0,
+):
+    """Render an N x H x W uint16 stack of the spots at ``spots``."""
+    import numpy as np
+
+    xs = np.arange(width)
+    ys = np.arange(height)
+    img = rng.normal(background, noise, (len(spots), height, width)).astype(np.float32)
+    for spot in range(2):
+        # Separable Gaussian: outer product of the x and y profiles
+        gx = np.exp(-((xs - spots[:, spot, 0:1]) ** 2) / (2 * sigma**2))
+        gy = np.exp(-((ys - spots[:, spot, 1:2]) ** 2) / (2 * sigma**2))
+        img += peak * gy[:, :, None] * gx[:, None, :]
+    return img.clip(0, 65535).astype(np.uint16)
+
+
+def synthetic_spot_stack(
+    frames,
+    width=128,
+    height=100,
+    separation=40.0,
+    jitter=1.0,
+    differential=0.5,
+    sigma=1.5,
+    peak=2000.0,
+    seed=0,
+    chunk_frames=500,
+):
+    """An N x H x W uint16 stack of two-spot frames plus the true centroids.
+
+    Returns ``(stack, truth)`` with ``truth`` an N x 2 x 2 array in
+    ``locate_spots_batch`` order.
+    """
+    import numpy as np
+
+    rng = np.random.default_rng(seed)
+    truth = spot_positions(rng, frames, width, height, separation, jitter, differential)
+    stack = np.empty((frames, height, width), dtype=np.uint16)
+    for start in range(0, frames, chunk_frames):
+        stack[start : start + chunk_frames] = render_frames(
+            rng, truth[start : start + chunk_frames], width, height, sigma, peak
+        )
+    return stack, truth
+
+
+def _card(keyword, value):
+    if isinstance(value, str):
+        text = f"'{value:8s}'"
+    elif isinstance(value, bool):
+        text = f"{'T' if value else 'F':>20s}"
+    else:
+        text = f"{value:>20}"
+    return f"{keyword:8s}= {text}".ljust(CARD_SIZE)
+
+
+def fits_frame(pixels, **keywords):
+    """FITS file bytes for a uint16 image, stored with the BZERO convention."""
+    height, width = pixels.shape
+    cards = [
+        _card("SIMPLE", True),
+        _card("BITPIX", 16),
+        _card("NAXIS", 2),
+        _card("NAXIS1", width),
+        _card("NAXIS2", height),
+        _card("BZERO", 32768),
+        _card("BSCALE", 1),
+    ]
+    cards += [_card(keyword, value) for keyword, value in keywords.items()]
+    cards.append("END".ljust(CARD_SIZE))
+    header = "".join(cards).encode("ascii")
+    header += b" " * (-len(header) % BLOCK_SIZE)
+    # Flipping the sign bit is the same as subtracting BZERO
+    data = (pixels ^ 0x8000).astype(">u2").tobytes()
+    return header + data + b"\0" * (-len(data) % BLOCK_SIZE)
+
+
+def write_frame(path, data, pattern="inplace", chunk_bytes=0):
+    """Write one frame to ``path`` the way a camera would.
+
+    ``inplace`` truncates and rewrites the file; ``rename`` writes a hidden
+    temporary file in the same directory and renames it over ``path``.
+    With ``chunk_bytes`` the data goes out in several writes, widening the
+    window in which a reader can see a partial frame.
+    """
+    path = Path(path)
+    target = path if pattern == "inplace" else path.with_name(f".{path.name}.tmp")
+    with open(target, "wb", buffering=0) as f:
+        step = chunk_bytes or len(data)
+        view = memoryview(data)
+        for offset in range(0, len(data), step):
+            f.write(view[offset : offset + step])
+    if target != path:
+        os.replace(target, path)
+
+
+def simulate(
+    path,
+    rate=100.0,
+    frames=0,
+    width=128,
+    height=100,
+    separation=40.0,
+    spot_jitter=1.0,
+    differential=0.5,
+    sigma=1.5,
+    peak=2000.0,
+    pattern="inplace",
+    chunk_bytes=0,
+    seed=None,
+    start_delay=0.0,
+    batch_frames=10,
+    interval_jitter=0.0,
+    quiet=False,
+):
+    """Write ``frames`` frames (0 = until interrupted) to ``path`` at ``rate`` Hz.
+
+    Frames are rendered ``batch_frames`` at a time with array operations on
+    a separate thread, up to about a second ahead of the writes, so the
+    write loop itself only formats the header and writes. With
+    ``interval_jitter`` (ms) each interval between writes is drawn from a
+    Gaussian of that standard deviation around the period, like a camera
+    with a noisy clock. A frame that falls behind schedule is written at
+    once. Returns a dict with the frames written, elapsed seconds, achieved
+    rate, and how many frames went out late (more than half a period behind
+    schedule) and the worst delay.
+    """
+    import numpy as np
+
+    spot_seed, timing_seed = np.random.SeedSequence(seed).spawn(2)
+    rng = np.random.default_rng(spot_seed)
+    timing = np.random.default_rng(timing_seed)
+    period = 1.0 / rate
+    batches = queue.Queue(maxsize=max(2, math.ceil(rate / batch_frames)))
+    stop = threading.Event()
+
+    def render():
+        rendered = 0
+        while not stop.is_set() and (not frames or rendered < frames):
+            count = batch_frames if not frames else min(batch_frames, frames - rendered)
+            spots = spot_positions(
+                rng, count, width, height, separation, spot_jitter, differential
+            )
+            stack = render_frames(rng, spots, width, height, sigma, peak)
+            rendered += count
+            while not stop.is_set():
+                try:
+                    batches.put(stack, timeout=0.1)
+                    break
+                except queue.Full:
+                    pass
+
+    renderer = threading.Thread(target=render, daemon=True)
+    renderer.start()
+    written = 0
+    late = 0
+    max_delay = 0.0
+    time.sleep(start_delay)
+    start = next_tick = time.monotonic()
+    try:
+        while not frames or written < frames:
+            for pixels in batches.get():
+                delay = time.monotonic() - next_tick
+                if delay > 0:
+                    if delay > period / 2:
+                        late += 1
+                    max_delay = max(max_delay, delay)
+                else:
+                    time.sleep(-delay)
+                now = datetime.now(timezone.utc)
+                data = fits_frame(
+                    pixels,
+                    **{
+                        "DATE-OBS": now.strftime("%Y-%m-%dT%H:%M:%S.%f"),
+                        "FRAMENUM": written,
+                    },
+                )
+                write_frame(path, data, pattern, chunk_bytes)
+                written += 1
+                if interval_jitter:
+                    next_tick += max(0.0, timing.normal(period, interval_jitter / 1000))
+                else:
+                    next_tick += period
+                if not quiet and written % 500 == 0:
+                    elapsed = time.monotonic() - start
+                    print(f"Wrote {written} frames ({written / elapsed:.1f} Hz)")
+    except KeyboardInterrupt:
+        pass
+    finally:
+        stop.set()
+        renderer.join()
+    elapsed = time.monotonic() - start
+    return {
+        "frames": written,
+        "seconds": elapsed,
+        "rate": written / elapsed if elapsed > 0 else 0.0,
+        "late": late,
+        "max_delay": max_delay,
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("path", help="FITS file to write, e.g. /tmp/dimm/boxframe.fits")
+    parser.add_argument(
+        "--rate", type=float, default=100.0, help="Frames per second (default: 100)"
+    )
+    parser.add_argument(
+        "-n",
+        "--frames",
+        type=int,
+        default=0,
+        help="Frames to write, 0 to run until interrupted (default: 0)",
+    )
+    parser.add_argument(
+        "--width", type=int, default=128, help="Frame width in pixels (default: 128)"
+    )
+    parser.add_argument(
+        "--height", type=int, default=100, help="Frame height in pixels (default: 100)"
+    )
+    parser.add_argument(
+        "--separation",
+        type=float,
+        default=40.0,
+        help="Spot separation in pixels (default: 40)",
+    )
+    parser.add_argument(
+        "--spot-jitter",
+        type=float,
+        default=1.0,
+        help="Common motion of both spots in pixels RMS per axis (default: 1.0)",
+    )
+    parser.add_argument(
+        "--differential",
+        type=float,
+        default=0.5,
+        help="Differential motion of the spots in pixels RMS per axis (default: 0.5)",
+    )
+    parser.add_argument(
+        "--sigma", type=float, default=1.5, help="Spot Gaussian sigma in pixels"
+    )
+    parser.add_argument("--peak", type=float, default=2000.0, help="Spot peak counts")
+    parser.add_argument(
+        "--seeing",
+        type=float,
+        help="Set the differential motion to match this seeing in arcsec; "
+        "needs --pixel-scale, --aperture and --baseline",
+    )
+    parser.add_argument(
+        "--pixel-scale", type=float, help="Plate scale in arcsec per pixel"
+    )
+    parser.add_argument(
+        "--aperture", type=float, help="Sub-aperture diameter in metres"
+    )
+    parser.add_argument(
+        "--baseline", type=float, help="Sub-aperture separation in metres"
+    )
+    parser.add_argument(
+        "--pattern",
+        choices=WRITE_PATTERNS,
+        default="inplace",
+        help="Rewrite the file in place, or write a temporary file and rename "
+        "it into place (default: inplace)",
+    )
+    parser.add_argument(
+        "--chunk-bytes",
+        type=int,
+        default=0,
+        help="Write each frame in chunks of this many bytes (default: one write)",
+    )
+    parser.add_argument(
+        "--interval-jitter",
+        type=float,
+        default=0.0,
+        help="Standard deviation in ms of the time between writes, drawn from "
+        "a Gaussian around the period (default: 0)",
+    )
+    parser.add_argument("--seed", type=int, default=None, help="Random seed")
+
+    args = parser.parse_args()
+    differential = args.differential
+    if args.seeing is not None:
+        if None in (args.pixel_scale, args.aperture, args.baseline):
+            parser.error("--seeing requires --pixel-scale, --aperture and --baseline")
+        differential = differential_sigmas(
+            args.seeing, args.pixel_scale, args.aperture, args.baseline
+        )
+
+    print(
+        f"Writing {args.width}x{args.height} frames to {args.path} "
+        f"at {args.rate} Hz ({args.pattern})"
+    )
+    if args.seeing is not None:
+        print(
+            f"Differential motion: {differential[0]:.3f} px longitudinal, "
+            f"{differential[1]:.3f} px transverse ({args.seeing}\" seeing)"
+        )
+    print("Press Ctrl+C to stop\n")
+    stats = simulate(
+        args.path,
+        rate=args.rate,
+        frames=args.frames,
+        width=args.width,
+        height=args.height,
+        separation=args.separation,
+        spot_jitter=args.spot_jitter,
+        differential=differential,
+        sigma=args.sigma,
+        peak=args.peak,
+        pattern=args.pattern,
+        chunk_bytes=args.chunk_bytes,
+        seed=args.seed,
+        interval_jitter=args.interval_jitter,
+    )
+    print(
+        f"\nWrote {stats['frames']} frames in {stats['seconds']:.3f}s "
+        f"({stats['rate']:.1f} Hz), {stats['late']} late, "
+        f"max delay {stats['max_delay'] * 1000:.1f} ms"
+    )
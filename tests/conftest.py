@@ -0,0 +1,55 @@
+import sys
+from datetime import datetime, timezone
+from pathlib import Path
+
+import pytest
+
+# The modules are standalone scripts rather than a package
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "scripts"))
+
+from copy_and_tar_dimm_data import DimmTarCaptureHandler  # noqa: E402
+from simulate_dimm_frames import (  # noqa: E402
+    fits_frame,
+    synthetic_spot_stack,
+    write_frame,
+)
+
+START_TIME = 1767225600.0  # 2026-01-01T00:00:00 UTC
+FRAME_PERIOD = 0.01
+
+
+@pytest.fixture(scope="session")
+def spot_frames():
+    """40 simulated frames as ``(fits_bytes, pixels, header_time, counter)``."""
+    stack, truth = synthetic_spot_stack(40, seed=1)
+    frames = []
+    for i, pixels in enumerate(stack):
+        when = START_TIME + i * FRAME_PERIOD
+        stamp = datetime.fromtimestamp(when, timezone.utc)
+        data = fits_frame(
+            pixels,
+            **{"DATE-OBS": stamp.strftime("%Y-%m-%dT%H:%M:%S.%f"), "FRAMENUM": i},
+        )
+        frames.append((data, pixels, when, i))
+    return frames
+
+
+@pytest.fixture
+def capture(tmp_path):
+    """Run frames through a capture handler, as the file watcher would.
+
+    Returns a function taking the frames and the handler options; each frame
+    is written to the source file and captured before the next one.
+    """
+
+    def run(frames, output="capture.tar", **options):
+        source = tmp_path / "boxframe.fits"
+        options.setdefault("frame_log", False)
+        handler = DimmTarCaptureHandler(source, tmp_path / output, 0, **options)
+        for data, *_ in frames:
+            write_frame(source, data)
+            handler.capture_frame()
+        handler.close()
+        return handler
+
+    return run
@@ -0,0 +1,60 @@
+"""Centroid-only capture: the table, its counters and the kept full frames."""
+import numpy as np
+
+from dimm_archive import SeekableFrameArchive, iter_tar_frames, load_centroid_table
+from simulate_dimm_frames import fits_frame
+
+
+def test_centroid_table(capture, spot_frames):
+    handler = capture(
+        spot_frames,
+        output="centroids",
+        output_format="centroids",
+        keep_every=10,
+    )
+
+    table, schema = load_centroid_table(handler.tar_path)
+    assert schema["count"] == len(spot_frames)
+    np.testing.assert_array_equal(table["counter"], np.arange(len(spot_frames)))
+    np.testing.assert_array_equal(
+        table["time"], [when for _, _, when, _ in spot_frames]
+    )
+    assert not np.isnan(table["x1"]).any()
+    # Spots sit 40 px apart along x
+    np.testing.assert_allclose(table["x2"] - table["x1"], 40, atol=3)
+
+    kept = list(iter_tar_frames(handler.tar_path / schema["frame_archive"]))
+    assert [data for _, data in kept] == [data for data, *_ in spot_frames[::10]]
+
+
+def test_centroid_table_counter_keyword(capture, spot_frames):
+    # Frames carry a second counter; the table follows the configured one
+    frames = [
+        (fits_frame(pixels, FRAMENUM=0, IMGNUM=100 + i), pixels, when, i)
+        for _, pixels, when, i in spot_frames
+    ]
+    handler = capture(
+        frames,
+        output="centroids",
+        output_format="centroids",
+        counter_keywords=("IMGNUM",),
+    )
+
+    table, _ = load_centroid_table(handler.tar_path)
+    np.testing.assert_array_equal(table["counter"], 100 + np.arange(len(frames)))
+
+
+def test_kept_frames_indexed(capture, spot_frames):
+    handler = capture(
+        spot_frames,
+        output="centroids",
+        output_format="centroids",
+        keep_every=4,
+        codec="pgzip",
+        index=True,
+    )
+
+    _, schema = load_centroid_table(handler.tar_path)
+    with SeekableFrameArchive(handler.tar_path / schema["frame_archive"]) as archive:
+        assert len(archive) == 10
+        assert archive.read_frame(3) == spot_frames[12][0]
@@ -0,0 +1,22 @@
+"""Delta (XOR) frames decode to the original FITS bytes."""
+from dimm_archive import DELTA_SUFFIX, SeekableFrameArchive, iter_tar_frames
+
+
+def test_delta_frames_decode(capture, spot_frames):
+    handler = capture(
+        spot_frames,
+        codec="pgzip",
+        index=True,
+        frame_encoding="delta",
+        keyframe_interval=16,
+    )
+
+    decoded = list(iter_tar_frames(handler.tar_path))
+    assert [data for _, data in decoded] == [data for data, *_ in spot_frames]
+    assert not any(name.endswith(DELTA_SUFFIX) for name, _ in decoded)
+
+    with SeekableFrameArchive(handler.tar_path) as archive:
+        assert not archive.names[0].endswith(DELTA_SUFFIX)
+        assert archive.names[1].endswith(DELTA_SUFFIX)
+        # Rebuilt from the keyframe at 32
+        assert archive.read_frame(37) == spot_frames[37][0]
@@ -0,0 +1,33 @@
+"""Binary event log round trip, including a record cut short."""
+from dimm_eventlog import EventLogWriter, read_event_log, unix_times
+from dimm_inotify import IN_CLOSE_WRITE, IN_MODIFY
+
+
+def test_event_log_roundtrip(tmp_path):
+    path = tmp_path / "events.bin"
+    log = EventLogWriter(path, batch_records=4)
+    records = [
+        (1_000_000 * i, IN_MODIFY if i % 2 else IN_CLOSE_WRITE, i) for i in range(10)
+    ]
+    for record in records:
+        log.append(*record)
+    log.close()
+    assert log.records == len(records)
+
+    events, header = read_event_log(path)
+    assert events.tolist() == records
+    assert header["version"] == 1
+    offset = (header["realtime_ns"] - header["monotonic_ns"]) / 1e9
+    assert abs(unix_times(events, header)[3] - (0.003 + offset)) < 1e-6
+
+
+def test_partial_record_ignored(tmp_path):
+    path = tmp_path / "events.bin"
+    log = EventLogWriter(path)
+    log.append(5, IN_MODIFY)
+    log.close()
+    with open(path, "ab") as f:
+        f.write(b"\x01\x02\x03")  # a monitor killed mid-write
+
+    events, _ = read_event_log(path)
+    assert events.tolist() == [(5, IN_MODIFY, 0)]
@@ -0,0 +1,27 @@
+"""Capture simulated frames into a memory-mapped cube and load it back."""
+import numpy as np
+
+from dimm_archive import load_frame_cube
+from dimm_writers import FrameCubeWriter
+
+
+def test_frame_cube(capture, spot_frames):
+    handler = capture(spot_frames, output="capture.cube", output_format="cube")
+
+    frames, timestamps = load_frame_cube(handler.tar_path)
+    np.testing.assert_array_equal(frames, [pixels for _, pixels, _, _ in spot_frames])
+    np.testing.assert_array_equal(timestamps, [when for _, _, when, _ in spot_frames])
+
+
+def test_unclosed_cube_loads(tmp_path, spot_frames):
+    # A capture killed before close() leaves the preallocated, untrimmed cube
+    writer = FrameCubeWriter(tmp_path / "capture.cube", initial_frames=16)
+    for data, _, when, i in spot_frames[:20]:
+        writer.add_frame(f"frame{i}.fits", data, when)
+    writer._frames.flush()
+    writer._times.flush()
+
+    frames, timestamps = load_frame_cube(writer.tar_path)
+    assert len(frames) == len(timestamps) == 20
+    np.testing.assert_array_equal(frames[-1], spot_frames[19][1])
+    writer.close()
@@ -0,0 +1,30 @@
+"""Frames the camera wrote but the capture never saw are counted as gaps."""
+from copy_and_tar_dimm_data import FrameGapDetector
+
+
+def test_counter_gaps_in_capture(capture, spot_frames):
+    skipped = {5, 6, 7, 20}
+    frames = [frame for i, frame in enumerate(spot_frames) if i not in skipped]
+    handler = capture(frames)
+
+    assert handler.gaps.dropped == len(skipped)
+    assert handler.gaps.gap_count == 2
+    assert [missing for _, missing, _ in handler.gaps.gaps] == [3, 1]
+
+
+def test_interval_gaps_from_learned_cadence():
+    gaps = FrameGapDetector()
+    times = [0.01 * i for i in range(10)] + [0.13, 0.14, 0.2]
+    missed = [gaps.update(None, when) for when in times]
+
+    # 0.09 -> 0.13 skips three frames, 0.14 -> 0.2 skips five
+    assert missed[-3:] == [3, 0, 5]
+    assert gaps.dropped == 8
+    assert gaps.longest_gap == gaps.gaps[-1][2]
+
+
+def test_counter_reset_is_not_a_gap():
+    gaps = FrameGapDetector(expected_rate=100)
+    for counter, when in [(10, 0.0), (11, 0.01), (0, 0.02), (1, 0.03)]:
+        gaps.update(counter, when)
+    assert gaps.dropped == 0
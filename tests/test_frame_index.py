@@ -0,0 +1,26 @@
+"""Capture simulated frames into a pgzip archive and seek through its index."""
+from dimm_archive import SeekableFrameArchive, iter_tar_frames
+
+
+def frame_bytes(frames):
+    return [data for data, *_ in frames]
+
+
+def test_pgzip_index_random_access(capture, spot_frames):
+    handler = capture(spot_frames, codec="pgzip", index=True, block_frames=8)
+    assert handler.copy_count == len(spot_frames)
+
+    with SeekableFrameArchive(handler.tar_path) as archive:
+        assert len(archive) == len(spot_frames)
+        assert archive.timestamps == [when for _, _, when, _ in spot_frames]
+        for i in (0, 7, 8, 23, -1):
+            assert archive.read_frame(i) == spot_frames[i][0]
+        assert archive.read_frame(archive.names[5]) == spot_frames[5][0]
+
+        start, end = spot_frames[10][2], spot_frames[14][2]
+        selected = list(archive.read_time_range(start, end))
+        assert [data for _, _, data in selected] == frame_bytes(spot_frames[10:14])
+
+    # The same archive is an ordinary tar.gz for sequential readers
+    names = [name for name, _ in iter_tar_frames(handler.tar_path)]
+    assert names == archive.names
@@ -0,0 +1,77 @@
+"""Frame times from FITS headers, the frame log, and skipping re-reads."""
+import csv
+
+from copy_and_tar_dimm_data import DimmTarCaptureHandler
+from dimm_archive import SeekableFrameArchive, iter_tar_frames
+from simulate_dimm_frames import fits_frame, write_frame
+
+
+def test_frames_timed_by_header(capture, spot_frames):
+    handler = capture(spot_frames, codec="pgzip", index=True)
+
+    assert handler.header_timed == len(spot_frames)
+    with SeekableFrameArchive(handler.tar_path) as archive:
+        assert archive.timestamps == [when for _, _, when, _ in spot_frames]
+        # Named by exposure time, not arrival
+        assert archive.names[1] == "boxframe_20260101_000000_010000.fits"
+
+
+def test_coarse_header_clock_without_counter(capture, spot_frames):
+    # One-second DATE-OBS and no counter: every frame has the same header time
+    frames = [
+        (fits_frame(pixels, **{"DATE-OBS": "2026-01-01T00:00:00"}), pixels, when, i)
+        for _, pixels, when, i in spot_frames
+    ]
+    handler = capture(frames)
+
+    assert handler.duplicates == 0
+    assert handler.copy_count == len(frames)
+    names = [name for name, _ in iter_tar_frames(handler.tar_path)]
+    assert len(set(names)) == len(frames)
+
+
+def test_non_integer_counter_ignored(capture, spot_frames):
+    # FRAME is one of the default counter keywords, here holding a string
+    frames = [
+        (fits_frame(pixels, FRAME="DARK"), pixels, when, i)
+        for _, pixels, when, i in spot_frames
+    ]
+    handler = capture(frames)
+
+    assert handler.duplicates == 0
+    assert handler.copy_count == len(frames)
+
+
+def test_reread_frame_skipped(tmp_path, spot_frames):
+    source = tmp_path / "boxframe.fits"
+    counted = fits_frame(spot_frames[0][1], FRAMENUM=7)
+    uncounted = fits_frame(spot_frames[1][1])
+    handler = DimmTarCaptureHandler(source, tmp_path / "out.tar", 0, frame_log=False)
+    for data in (counted, uncounted):
+        write_frame(source, data)
+        handler.capture_frame()
+        handler.capture_frame()  # a second event for the same write
+    handler.close()
+
+    assert handler.copy_count == 2
+    assert handler.duplicates == 2
+
+
+def test_frame_log_rotates_with_archives(capture, spot_frames):
+    handler = capture(spot_frames, codec="none", frame_log=True, rotate_bytes=40000)
+
+    archives = [archive.tar_path for archive in handler.archives]
+    assert len(archives) > 1
+    assert handler.frame_log.paths == [f"{path}.frames.csv" for path in archives]
+    for path in archives:
+        names = [name for name, _ in iter_tar_frames(path)]
+        with open(f"{path}.frames.csv") as f:
+            rows = list(csv.DictReader(f))
+        assert [row["name"] for row in rows] == names
+
+
+def test_no_frame_log_in_ring_mode(capture, spot_frames):
+    handler = capture(spot_frames, frame_log=True, ring_seconds=0.1)
+
+    assert handler.frame_log is None
+    assert not list(handler.tar_path.parent.glob("*.frames.csv"))
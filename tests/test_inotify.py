@@ -0,0 +1,89 @@
+"""The native inotify watcher, for in-place writes and rename-into-place."""
+import os
+import threading
+
+from dimm_inotify import (
+    IN_CLOSE_WRITE,
+    Inotify,
+    InotifyFileWatcher,
+    InotifyMultiFileWatcher,
+)
+
+TIMEOUT = 5.0
+
+
+class Counter:
+    """A callback that counts calls and lets the test wait for them."""
+
+    def __init__(self):
+        self.calls = 0
+        self._changed = threading.Condition()
+
+    def __call__(self):
+        with self._changed:
+            self.calls += 1
+            self._changed.notify_all()
+
+    def wait_for(self, calls):
+        with self._changed:
+            return self._changed.wait_for(lambda: self.calls >= calls, TIMEOUT)
+
+
+def test_read_close_write(tmp_path):
+    path = tmp_path / "frame.fits"
+    path.touch()
+    inotify = Inotify()
+    try:
+        wd = inotify.add_watch(path, IN_CLOSE_WRITE)
+        path.write_bytes(b"frame")
+        events = inotify.read_events(TIMEOUT)
+    finally:
+        inotify.close()
+    assert [(w, mask & IN_CLOSE_WRITE) for w, mask, _, _ in events] == [
+        (wd, IN_CLOSE_WRITE)
+    ]
+
+
+def test_watcher_follows_rename_into_place(tmp_path):
+    path = tmp_path / "boxframe.fits"
+    path.touch()
+    callback = Counter()
+    watcher = InotifyFileWatcher(path, callback, poll_interval=0.05)
+    watcher.start()
+    try:
+        path.write_bytes(b"in place")
+        assert callback.wait_for(1)
+
+        # A temp file renamed over the source is a frame too, on a new inode
+        temp = tmp_path / "boxframe.fits.tmp"
+        temp.write_bytes(b"renamed")
+        os.replace(temp, path)
+        assert callback.wait_for(2)
+
+        # The watch moved to the new inode, so in-place writes still count
+        path.write_bytes(b"in place again")
+        assert callback.wait_for(3)
+    finally:
+        watcher.stop()
+        watcher.join()
+    assert callback.calls == 3
+
+
+def test_multi_file_watcher_dispatch(tmp_path):
+    paths = [tmp_path / "east.fits", tmp_path / "west" / "west.fits"]
+    paths[1].parent.mkdir()
+    callbacks = {path: Counter() for path in paths}
+    for path in paths:
+        path.touch()
+    watcher = InotifyMultiFileWatcher(callbacks, poll_interval=0.05)
+    watcher.start()
+    try:
+        for _ in range(3):
+            paths[0].write_bytes(b"east")
+        paths[1].write_bytes(b"west")
+        assert callbacks[paths[0]].wait_for(3)
+        assert callbacks[paths[1]].wait_for(1)
+    finally:
+        watcher.stop()
+        watcher.join()
+    assert [callbacks[path].calls for path in paths] == [3, 1]
@@ -0,0 +1,28 @@
+"""Rice-compressed frames decode to the original FITS bytes."""
+import tarfile
+
+import pytest
+
+from dimm_archive import RICE_SUFFIX, RICE_VERSION, decode_rice_frame, iter_tar_frames
+
+
+def test_rice_frames_decode(capture, spot_frames):
+    pytest.importorskip("imagecodecs")
+    handler = capture(spot_frames, codec="none", frame_encoding="rice")
+
+    decoded = list(iter_tar_frames(handler.tar_path))
+    assert [data for _, data in decoded] == [data for data, *_ in spot_frames]
+    assert handler.encoder.bytes_out < handler.encoder.bytes_in
+
+
+def test_unknown_format_version_rejected(capture, spot_frames):
+    pytest.importorskip("imagecodecs")
+    handler = capture(spot_frames[:1], codec="none", frame_encoding="rice")
+
+    with tarfile.open(handler.tar_path) as tar:
+        (member,) = tar.getmembers()
+        name, data = member.name, tar.extractfile(member).read()
+    assert name.endswith(RICE_SUFFIX)
+    assert decode_rice_frame(data) == spot_frames[0][0]
+    with pytest.raises(ValueError, match="version"):
+        decode_rice_frame(bytes([RICE_VERSION + 1]) + data[1:])
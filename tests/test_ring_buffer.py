@@ -0,0 +1,65 @@
+"""Ring-buffer capture: pre-trigger history and the post-trigger window."""
+from copy_and_tar_dimm_data import DimmTarCaptureHandler
+from dimm_archive import iter_tar_frames
+from simulate_dimm_frames import write_frame
+
+
+def ring_capture(tmp_path, frames, triggers, **options):
+    """Capture frames 10 ms apart, triggering before each index in ``triggers``."""
+    source = tmp_path / "boxframe.fits"
+    handler = DimmTarCaptureHandler(
+        source,
+        tmp_path / "ring.tar",
+        0,
+        frame_log=False,
+        ring_seconds=0.045,
+        post_seconds=0.055,
+        **options,
+    )
+    for i, (data, *_) in enumerate(frames):
+        if i in triggers:
+            handler.ring.trigger()
+        write_frame(source, data)
+        handler.capture_frame()
+    handler.close()
+    return handler
+
+
+def archived(handler):
+    return [
+        [data for _, data in iter_tar_frames(archive.tar_path)]
+        for archive in handler.archives
+    ]
+
+
+def test_trigger_archives_history_and_window(tmp_path, spot_frames):
+    handler = ring_capture(tmp_path, spot_frames, triggers={20})
+
+    # 40 ms of history before frame 20, then 50 ms after it
+    frames = [data for data, *_ in spot_frames]
+    assert archived(handler) == [frames[15:26]]
+    assert handler.ring.triggers == 1
+
+
+def test_trigger_in_window_extends_archive(tmp_path, spot_frames):
+    handler = ring_capture(tmp_path, spot_frames, triggers={20, 24, 35})
+
+    frames = [data for data, *_ in spot_frames]
+    assert archived(handler) == [frames[15:30], frames[30:40]]
+    assert handler.ring.triggers == 3
+
+
+def test_events_written_in_background(tmp_path, spot_frames):
+    # Pooled read buffers are reused as soon as capture_frame returns, and
+    # the delta encoder is shared by both events
+    handler = ring_capture(
+        tmp_path,
+        spot_frames,
+        triggers={20, 35},
+        zero_copy=True,
+        frame_encoding="delta",
+    )
+
+    frames = [data for data, *_ in spot_frames]
+    assert archived(handler) == [frames[15:26], frames[30:40]]
+    assert handler.ring.dropped == 0
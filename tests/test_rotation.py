@@ -0,0 +1,27 @@
+"""Rotated archives together hold every captured frame, in order."""
+from dimm_archive import iter_tar_frames
+
+
+def archived(handler):
+    return [
+        [data for _, data in iter_tar_frames(archive.tar_path)]
+        for archive in handler.archives
+    ]
+
+
+def test_rotate_by_frame_time(capture, spot_frames):
+    # Archives start at frames 0, 15 and 30, 150 ms of frame time apart
+    handler = capture(spot_frames, codec="pgzip", index=True, rotate_seconds=0.145)
+
+    frames = [data for data, *_ in spot_frames]
+    assert archived(handler) == [frames[:15], frames[15:30], frames[30:]]
+    assert handler.writer.rotations == 2
+
+
+def test_rotate_by_size_loses_no_frames(capture, spot_frames):
+    handler = capture(spot_frames, codec="none", rotate_bytes=40000)
+
+    parts = archived(handler)
+    assert len(parts) > 2
+    assert sum(parts, []) == [data for data, *_ in spot_frames]
+    assert len({archive.tar_path for archive in handler.archives}) == len(parts)
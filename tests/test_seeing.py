@@ -0,0 +1,38 @@
+"""Seeing estimates recover the seeing the simulated spot motion was drawn for."""
+import numpy as np
+import pytest
+
+from dimm_seeing import SeeingEstimator
+from simulate_dimm_frames import differential_sigmas, synthetic_spot_stack
+
+PIXEL_SCALE, APERTURE, BASELINE = 0.3, 0.06, 0.2
+
+
+@pytest.mark.parametrize("seeing", [0.8, 1.5])
+def test_estimate_matches_simulated_seeing(seeing):
+    sigmas = differential_sigmas(seeing, PIXEL_SCALE, APERTURE, BASELINE)
+    stack, _ = synthetic_spot_stack(1000, differential=sigmas, seed=3)
+    estimator = SeeingEstimator(PIXEL_SCALE, APERTURE, BASELINE, interval=5.0)
+
+    estimates = estimator.add_stack(stack, np.arange(len(stack)) * 0.01)
+
+    # One estimate per 5 s of frame time; the last interval is still open
+    assert len(estimates) == 1
+    for estimate in estimates + [estimator.finish()]:
+        assert estimate.seeing == pytest.approx(seeing, rel=0.05)
+        assert estimate.seeing_l == pytest.approx(seeing, rel=0.1)
+        assert estimate.seeing_t == pytest.approx(seeing, rel=0.1)
+
+
+def test_frame_by_frame_matches_stack(spot_frames):
+    stack = np.array([pixels for _, pixels, _, _ in spot_frames])
+    times = [when for _, _, when, _ in spot_frames]
+    by_stack = SeeingEstimator(PIXEL_SCALE, APERTURE, BASELINE, min_frames=10)
+    by_frame = SeeingEstimator(PIXEL_SCALE, APERTURE, BASELINE, min_frames=10)
+
+    by_stack.add_stack(stack, times)
+    for pixels, when in zip(stack, times):
+        by_frame.add_frame(pixels, when)
+
+    expected = by_stack.finish()
+    assert by_frame.finish().seeing == pytest.approx(expected.seeing)
@@ -0,0 +1,35 @@
+"""P2 quantile estimates and the streaming inter-arrival summary."""
+import numpy as np
+import pytest
+
+from dimm_stats import P2Quantile, StreamingSummary
+
+
+def test_p2_exact_for_first_samples():
+    estimator = P2Quantile(0.5)
+    assert estimator.value is None
+    for x in (5.0, 1.0, 3.0):
+        estimator.add(x)
+    assert estimator.value == 3.0
+
+
+@pytest.mark.parametrize("p", [0.5, 0.9, 0.99])
+def test_p2_tracks_quantile(p):
+    values = np.random.default_rng(0).normal(10.0, 2.0, 20000)
+    estimator = P2Quantile(p)
+    for x in values:
+        estimator.add(x)
+    assert estimator.value == pytest.approx(np.quantile(values, p), abs=0.1)
+
+
+def test_streaming_summary_reset():
+    summary = StreamingSummary()
+    for x in range(1, 101):
+        summary.add(float(x))
+    assert summary.n == 100
+    assert summary.stats.mean == pytest.approx(50.5)
+    assert summary.quantile(0.5) == pytest.approx(50.5, abs=1.0)
+
+    summary.reset()
+    assert summary.n == 0
+    assert summary.quantile(0.5) is None
@@ -0,0 +1,47 @@
+"""Half-written source files are re-read, and skipped if they stay torn."""
+import copy_and_tar_dimm_data
+from copy_and_tar_dimm_data import DimmTarCaptureHandler
+from dimm_archive import iter_tar_frames
+from simulate_dimm_frames import write_frame
+
+
+def torn_capture(tmp_path, monkeypatch, data, completed):
+    """Capture a frame that is half-written when first read.
+
+    ``completed`` is what the writer has left by the first retry, or None if
+    it never finishes.
+    """
+    source = tmp_path / "boxframe.fits"
+    write_frame(source, data[: len(data) // 2])
+    sleep = copy_and_tar_dimm_data.time.sleep
+
+    def finish_write(seconds):
+        if completed is not None:
+            write_frame(source, completed)
+        sleep(seconds)
+
+    handler = DimmTarCaptureHandler(source, tmp_path / "out.tar", 0, frame_log=False)
+    handler.quiet = True
+    monkeypatch.setattr(copy_and_tar_dimm_data.time, "sleep", finish_write)
+    handler.capture_frame()
+    monkeypatch.undo()
+    handler.close()
+    return handler
+
+
+def test_torn_read_retried(tmp_path, monkeypatch, spot_frames):
+    data = spot_frames[0][0]
+    handler = torn_capture(tmp_path, monkeypatch, data, data)
+
+    assert handler.torn_reads == 1
+    assert handler.torn_frames == 0
+    assert [frame for _, frame in iter_tar_frames(handler.tar_path)] == [data]
+
+
+def test_torn_frame_skipped(tmp_path, monkeypatch, spot_frames):
+    handler = torn_capture(tmp_path, monkeypatch, spot_frames[0][0], None)
+
+    assert handler.torn_reads == handler.read_retries + 1
+    assert handler.torn_frames == 1
+    assert handler.last_torn.startswith("truncated data")
+    assert list(iter_tar_frames(handler.tar_path)) == []